@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import uuid
+import queue
+import atexit
+import random
+import logging
+import datetime
+import functools
+import threading
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+from flask import has_request_context, session, request, g
+
+import metrics
+
+# --- Structured, non-blocking logging ---
+# get_logger(__name__).info("event_name", key=value, ...) emits one key=value line (or JSON with
+# LOG_FORMAT=json) carrying the request_id and session_id of the current request. The request thread only
+# puts the record on a bounded queue; a listener thread formats and writes it to stdout. When the queue is
+# full, records are dropped and counted (log_records_dropped_total) instead of blocking the request.
+#
+# Debug events are sampled per request: with LOG_DEBUG_SAMPLE_RATE=0.01, 1% of requests log their debug
+# events in full (LOG_LEVEL=DEBUG logs all of them). With the defaults (LOG_LEVEL=INFO,
+# LOG_DEBUG_SAMPLE_RATE=0) a debug call returns after a single level check; LOG_LEVEL=OFF disables logging.
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "logfmt") # logfmt | json
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+ROOT_LOGGER = "quiz"
+_debug_rate = 1.0 if LOG_LEVEL == "DEBUG" else LOG_DEBUG_SAMPLE_RATE
+
+metrics.describe("log_records_dropped_total", "Log records dropped because the log queue was full.")
+
+# {"request_id", "session_id", "debug_sampled"} of the request (or background task) being handled
+_context = contextvars.ContextVar("log_context", default={})
+
+
+class _ContextQueueHandler(QueueHandler):
+    """Enqueues records without formatting them; formatting happens on the listener thread."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self._listener = None
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+
+    def emit(self, record):
+        record.context = current_context()
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("log_records_dropped_total")
+
+    def _ensure_listener(self):
+        # Started lazily and per process, so workers forked from a preloaded app get their own thread
+        if self._listener_pid == os.getpid():
+            return
+        with self._listener_lock:
+            if self._listener_pid == os.getpid():
+                return
+            stream_handler = logging.StreamHandler(sys.stdout)
+            stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else LogfmtFormatter())
+            self._listener = QueueListener(self.queue, stream_handler)
+            self._listener.start()
+            self._listener_pid = os.getpid()
+            atexit.register(self._listener.stop) # Flushes the records still in the queue
+
+
+def _sample_debug() -> bool:
+    return _debug_rate >= 1 or random.random() < _debug_rate
+
+
+def _debug_sampled() -> bool:
+    """The current request's sampling decision; outside requests each debug event is sampled on its own."""
+    sampled = _context.get().get("debug_sampled")
+    return _sample_debug() if sampled is None else sampled
+
+
+def _record_fields(record) -> dict:
+    fields = {
+        "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+        "level": record.levelname.lower(),
+        "logger": record.name,
+        "event": record.getMessage(),
+    }
+    for key, value in getattr(record, "context", {}).items():
+        if key != "debug_sampled" and value is not None:
+            fields[key] = value
+    fields.update(getattr(record, "fields", {}))
+    if record.exc_info:
+        fields["exc"] = logging.Formatter().formatException(record.exc_info)
+    return fields
+
+
+def _logfmt_value(value) -> str:
+    text = str(value)
+    if not text or any(char in text for char in ' ="\n\\'):
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+class LogfmtFormatter(logging.Formatter):
+    def format(self, record):
+        return " ".join(f"{key}={_logfmt_value(value)}" for key, value in _record_fields(record).items())
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(_record_fields(record), ensure_ascii=False, default=str)
+
+
+class StructuredLogger:
+    """Thin wrapper taking an event name and key/value fields: log.info("answer_stored", axis=..., index=...).
+    Fields are formatted on the listener thread, so pass immutable values (strings, numbers)."""
+
+    def __init__(self, logger):
+        self._logger = logger
+
+    def _log(self, level, event, fields, exc_info=False):
+        if self._logger.isEnabledFor(level) and (level > logging.DEBUG or _debug_sampled()):
+            # makeRecord + handle skips Logger.log's stack walk for the caller's file and line, which we don't log
+            record = self._logger.makeRecord(self._logger.name, level, "", 0, event, (),
+                                             sys.exc_info() if exc_info else None, extra={"fields": fields})
+            self._logger.handle(record)
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event, **fields):
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event, **fields):
+        """Logs at error level with the traceback of the exception being handled."""
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+
+def _configure_root():
+    root = logging.getLogger(ROOT_LOGGER)
+    root.propagate = False
+    if LOG_LEVEL == "OFF":
+        # Above every level, so no record is created; the NullHandler keeps logging.lastResort from
+        # printing warnings of the (handler-less, non-propagating) tree to stderr
+        root.setLevel(logging.CRITICAL + 1)
+        root.addHandler(logging.NullHandler())
+        return root
+    level = logging.getLevelName(LOG_LEVEL)
+    if not isinstance(level, int):
+        level = logging.INFO
+    # Debug records must pass the level check when they may be sampled; StructuredLogger drops unsampled ones
+    root.setLevel(logging.DEBUG if _debug_rate > 0 else level)
+    root.addHandler(_ContextQueueHandler(queue.Queue(LOG_QUEUE_SIZE)))
+    return root
+
+
+_root = _configure_root()
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Returns a structured logger below the app's root logger, e.g. get_logger(__name__)."""
+    return StructuredLogger(_root.getChild(name))
+
+
+def current_context() -> dict:
+    """Log context of the current request or task; adds the quiz ID once the request has used the session."""
+    context = _context.get()
+    if has_request_context() and getattr(session, "accessed", False) and "session_id" not in context:
+        # Only read a session the route has opened anyway, so cacheable pages don't get 'Vary: Cookie'
+        quiz_id = session.get("quiz_id")
+        if quiz_id:
+            context = dict(context, session_id=quiz_id)
+    return context
+
+
+def with_log_context(func):
+    """Wraps func so it logs with the caller's request and session IDs when run on a worker thread."""
+    context = dict(current_context())
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _context.set(context)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _context.reset(token)
+    return wrapper
+
+
+def init_logging(app):
+    """Assigns each request an ID (the incoming X-Request-ID, if valid) and its debug sampling decision."""
+
+    @app.before_request
+    def _bind_request_context():
+        request_id = request.headers.get("X-Request-ID", "")
+        if not (0 < len(request_id) <= 64 and request_id.isascii() and request_id.replace("-", "").isalnum()):
+            request_id = uuid.uuid4().hex[:16]
+        g.log_context_token = _context.set({"request_id": request_id, "debug_sampled": _sample_debug()})
+
+    @app.after_request
+    def _add_request_id(response):
+        response.headers.setdefault("X-Request-ID", _context.get().get("request_id", ""))
+        return response
+
+    @app.teardown_request
+    def _unbind_request_context(exc):
+        token = g.pop("log_context_token", None)
+        if token is not None:
+            _context.reset(token)
@@ -0,0 +1,115 @@
+import os
+import json
+import math
+import heapq
+
+from app_logging import get_logger
+
+# --- Nearest-archetype matching ---
+# Compares the five value_percent scores from create_axes_data() with reference profiles (ideologies,
+# parties, historical respondents...) stored in ARCHETYPES_FILE. A small KD-tree keeps queries in the
+# microsecond range even for hundreds of thousands of references; no LLM call is involved.
+
+ARCHETYPES_FILE = os.getenv("ARCHETYPES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archetypes.json"))
+ARCHETYPES_TOP_K = int(os.getenv("ARCHETYPES_TOP_K", "3"))
+KDTREE_LEAF_SIZE = 16
+log = get_logger("archetypes")
+
+
+class KDTree:
+    """Static KD-tree over equal-length numeric tuples, stored in flat lists."""
+
+    def __init__(self, points: list):
+        self.points = points
+        self.order = list(range(len(points))) # Point indices, permuted so each leaf is a contiguous slice
+        self.split_dim = [] # -1 marks a leaf
+        self.split_value = []
+        self.children = [] # (left, right) node ids, or (start, end) slice of self.order for leaves
+        if points:
+            self._build(0, len(points), 0)
+
+    def _build(self, start: int, end: int, depth: int) -> int:
+        node = len(self.split_dim)
+        self.split_dim.append(-1)
+        self.split_value.append(0.0)
+        self.children.append((start, end))
+        if end - start <= KDTREE_LEAF_SIZE:
+            return node
+        dim = depth % len(self.points[0])
+        self.order[start:end] = sorted(self.order[start:end], key=lambda i: self.points[i][dim])
+        middle = (start + end) // 2
+        self.split_dim[node] = dim
+        self.split_value[node] = self.points[self.order[middle]][dim]
+        left = self._build(start, middle, depth + 1)
+        right = self._build(middle, end, depth + 1)
+        self.children[node] = (left, right)
+        return node
+
+    def query(self, point, k: int) -> list:
+        """Returns [(distance, point_index), ...] of the k nearest points, nearest first."""
+        if not self.points or k <= 0:
+            return []
+        point = tuple(point)
+        best = [] # Max-heap of (-distance, index)
+        # (node, squared distance from point to the node's cell, per-dimension offsets to the cell)
+        stack = [(0, 0.0, (0.0,) * len(point))]
+        points, order, dist = self.points, self.order, math.dist
+        while stack:
+            node, bound, offsets = stack.pop()
+            if len(best) == k and bound >= best[0][0] * best[0][0]:
+                continue
+            dim = self.split_dim[node]
+            if dim < 0:
+                start, end = self.children[node]
+                for i in order[start:end]:
+                    distance = dist(point, points[i])
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, i))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, i))
+                continue
+            diff = point[dim] - self.split_value[node]
+            left, right = self.children[node]
+            near, far = (left, right) if diff < 0 else (right, left)
+            # The far cell is at least |diff| away along dim, on top of the offsets in the other dimensions
+            far_bound = bound - offsets[dim] * offsets[dim] + diff * diff
+            far_offsets = offsets[:dim] + (diff,) + offsets[dim + 1:]
+            stack.append((far, far_bound, far_offsets))
+            stack.append((near, bound, offsets)) # Visited first
+        return [(-negative, i) for negative, i in sorted(best, reverse=True)]
+
+
+class ArchetypeMatcher:
+    """Finds the reference profiles closest to a user's axis scores."""
+
+    def __init__(self, axes: list, profiles: list):
+        self.axes = axes # Axis names, in the order of each profile's "values"
+        self.profiles = profiles
+        self.tree = KDTree([tuple(float(v) for v in profile["values"]) for profile in profiles])
+        self.max_distance = 100 * math.sqrt(len(axes))
+
+    def match(self, axes_data: list, k: int = ARCHETYPES_TOP_K) -> list:
+        """Returns the k nearest profiles as dicts with name, kind, distance and similarity_percent."""
+        scores = {axis["axis_name"]: axis["value_percent"] for axis in axes_data}
+        point = tuple(float(scores.get(axis_name, 50.0)) for axis_name in self.axes)
+        matches = []
+        for distance, i in self.tree.query(point, k):
+            profile = self.profiles[i]
+            matches.append({
+                "name": profile["name"],
+                "kind": profile.get("kind", ""),
+                "distance": round(distance, 1),
+                "similarity_percent": round(100 * (1 - distance / self.max_distance), 1),
+            })
+        return matches
+
+
+def load_archetype_matcher(path: str = ARCHETYPES_FILE):
+    """Loads the reference table; returns None (and the summary page simply omits matches) if unavailable."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            table = json.load(f)
+    except (OSError, ValueError) as e:
+        log.warning("archetypes_unavailable", path=path, error=e)
+        return None
+    return ArchetypeMatcher(table["axes"], table["profiles"])
@@ -0,0 +1,66 @@
+"""Benchmark of nearest-archetype matching on a large synthetic reference table.
+
+Usage: python benchmarks/bench_archetypes.py [--references 300000] [--queries 2000] [--k 3]
+"""
+import os
+import sys
+import random
+import argparse
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archetypes import ArchetypeMatcher
+
+AXES = ["Polityka Gospodarcza", "Polityka Społeczna", "Polityka Narodowa", "Polityka Środowiskowa", "Władza i Porządek"]
+
+
+def random_scores(rng: random.Random) -> list:
+    return [round(min(100, max(0, rng.gauss(50, 20))), 1) for _ in AXES]
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--references", type=int, default=300000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    profiles = [{"name": f"respondent {i}", "kind": "respondent", "values": random_scores(rng)} for i in range(args.references)]
+    start = time.perf_counter()
+    matcher = ArchetypeMatcher(AXES, profiles)
+    build_time = time.perf_counter() - start
+
+    queries = [[{"axis_name": name, "value_percent": v} for name, v in zip(AXES, random_scores(rng))]
+               for _ in range(args.queries)]
+    times = []
+    for axes_data in queries:
+        start = time.perf_counter()
+        matcher.match(axes_data, args.k)
+        times.append(time.perf_counter() - start)
+    times.sort()
+
+    # Exhaustive scan on a few queries, both as a correctness check and as the baseline
+    scan_times = []
+    for axes_data in queries[:20]:
+        point = [axis["value_percent"] for axis in axes_data]
+        start = time.perf_counter()
+        expected = sorted(sum((a - b) ** 2 for a, b in zip(point, p["values"])) ** 0.5 for p in profiles)[:args.k]
+        scan_times.append(time.perf_counter() - start)
+        got = [match["distance"] for match in matcher.match(axes_data, args.k)]
+        assert all(abs(g - e) <= 0.051 for g, e in zip(got, expected)), (got, expected) # distance is rounded to 0.1
+
+    print(f"references: {args.references}, k: {args.k}, tree build: {build_time:.2f} s")
+    print(f"kd-tree query: mean {sum(times) / len(times) * 1e6:.1f} us, p50 {percentile(times, 0.5) * 1e6:.1f} us, "
+          f"p99 {percentile(times, 0.99) * 1e6:.1f} us")
+    print(f"linear scan:   mean {sum(scan_times) / len(scan_times) * 1e3:.1f} ms (results match)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Offline load test of generate_questions against a fake model with injected latency and faults.
+
+Usage: python benchmarks/bench_generate_questions.py [--calls 500] [--threads 16]
+Fault mix is configured with the usual variables, e.g.
+    FAKE_LATENCY=lognormal:-2,0.5 FAKE_ERROR_RATE=0.05 FAKE_WRONG_COUNT_RATE=0.1 FAKE_TRUNCATE_RATE=0.05
+MODEL_BACKEND defaults to 'synthetic' and LOG_LEVEL to OFF; set MODEL_BACKEND=replay MODEL_CASSETTE=... to use recorded responses.
+"""
+import os
+import sys
+import argparse
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MODEL_BACKEND", "synthetic")
+os.environ.setdefault("LOG_LEVEL", "OFF")
+
+import flask_app
+
+
+def classify(questions: list) -> str:
+    if any("API Error" in q for q in questions):
+        return "api_error"
+    if any(q.startswith("Placeholder") for q in questions):
+        return "placeholder"
+    return "ok"
+
+
+def timed_call(axis_definition: dict):
+    start = time.perf_counter()
+    questions = flask_app.generate_questions(axis_definition)
+    return time.perf_counter() - start, classify(questions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    axes = [flask_app.AXES_DEFINITIONS[i % len(flask_app.AXES_DEFINITIONS)] for i in range(args.calls)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(timed_call, axes))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    outcomes = Counter(outcome for _, outcome in results)
+    print(f"backend: {flask_app.MODEL_BACKEND}, calls: {args.calls}, threads: {args.threads}, wall time: {elapsed:.2f} s")
+    print(f"latency: mean {statistics.mean(latencies) * 1000:.1f} ms, p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+    print("outcomes: " + ", ".join(f"{name} {outcomes[name]} ({outcomes[name] / args.calls:.1%})"
+                                   for name in ("ok", "placeholder", "api_error")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Offline simulation of hedged model calls: tail latency versus extra requests.
+
+Usage: python benchmarks/bench_hedging.py [--calls 2000] [--latency pareto:0.02,1.5] [--percentiles 0.9,0.95,0.99]
+"""
+import os
+import sys
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOG_LEVEL", "OFF")
+
+import metrics
+from model_backends import SyntheticModel, FaultInjectingModel, HedgedModel
+
+PROMPT = "Podsumowanie testowe"
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run(model, calls: int, threads: int):
+    """Returns (sorted latencies, number of calls that raised)."""
+    def timed_call(_):
+        start = time.perf_counter()
+        try:
+            model.generate_content(PROMPT)
+            failed = False
+        except Exception:
+            failed = True
+        return time.perf_counter() - start, failed
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(timed_call, range(calls)))
+    return sorted(latency for latency, _ in results), sum(failed for _, failed in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--latency", default="pareto:0.02,1.5", help="FAKE_LATENCY-style distribution of each model")
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--percentiles", default="0.9,0.95,0.99")
+    args = parser.parse_args()
+
+    def fake(seed):
+        return FaultInjectingModel(SyntheticModel(), latency=args.latency, error_rate=args.error_rate, seed=seed)
+
+    print(f"{'setup':<18} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7} {'hedge rate':>10} {'hedge wins':>10}")
+    latencies, errors = run(fake(1), args.calls, args.threads)
+    print(f"{'no hedging':<18} {percentile(latencies, 0.5) * 1e3:8.1f} {percentile(latencies, 0.99) * 1e3:8.1f} "
+          f"{latencies[-1] * 1e3:8.1f} {errors:7d} {0:10.1%} {0:10.1%}")
+    for fraction in (float(p) for p in args.percentiles.split(",")):
+        before_requests = metrics.get("model_requests_total", kind="summary")
+        before_hedges = metrics.get("model_hedges_total", kind="summary")
+        before_wins = metrics.get("model_hedge_wins_total", kind="summary")
+        # Primary pool sized like create_model_backend does: twice the callers, for primaries that lost
+        model = HedgedModel(fake(1), fake(2), percentile=fraction, default_delay=0.05, workers=args.threads * 2,
+                            hedge_workers=args.threads)
+        latencies, errors = run(model, args.calls, args.threads)
+        requests = metrics.get("model_requests_total", kind="summary") - before_requests
+        hedges = metrics.get("model_hedges_total", kind="summary") - before_hedges
+        wins = metrics.get("model_hedge_wins_total", kind="summary") - before_wins
+        print(f"{f'hedge at p{fraction * 100:g}':<18} {percentile(latencies, 0.5) * 1e3:8.1f} "
+              f"{percentile(latencies, 0.99) * 1e3:8.1f} {latencies[-1] * 1e3:8.1f} {errors:7d} "
+              f"{hedges / requests:10.1%} {wins / requests:10.1%}")
+    print("hedge rate = extra model requests per call (the added spend).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Microbenchmarks of the in-process request work, compared against the baselines in benchmarks/baselines.json.
+
+Usage: python benchmarks/bench_micro.py [--filter NAME] [--repeat 25] [--threshold 0.25] [--save]
+Runs offline: model calls are answered from a memo of SyntheticModel responses, so only the app's own work
+(prompt assembly, parsing, scoring, session serialization, template rendering) is measured. Each benchmark
+reports the best per-call time over --repeat rounds and the peak memory allocated by one call (tracemalloc).
+Times are compared after scaling by a reference workload timed alongside each benchmark, so a busy or
+slower machine does not show up as a regression.
+Exits with status 1 if a benchmark is slower or allocates more than its baseline by more than --threshold.
+--save rewrites the baselines; commit them together with the change that moved the numbers.
+"""
+import gc
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["MODEL_BACKEND"] = "synthetic"
+os.environ["LOG_LEVEL"] = "OFF"
+os.environ.setdefault("RESULTS_DIR", os.path.join(tempfile.gettempdir(), "bench-results")) # Nothing is stored
+
+import flask_app
+from flask import render_template
+from model_backends import SyntheticModel
+
+BASELINES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+ROUND_SECONDS = 0.02
+MEMORY_SLACK_KIB = 1.0 # Peaks this small move by a few objects between runs; not flagged below this delta
+
+
+class MemoizedModel:
+    """Answers each distinct prompt once from the inner model, then from memory."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.responses = {}
+
+    def generate_content(self, prompt, **kwargs):
+        response = self.responses.get(prompt)
+        if response is None:
+            response = self.responses[prompt] = self.inner.generate_content(prompt)
+        return response
+
+
+def completed_quiz(seed: int = 1):
+    """Questions and answers of a finished quiz, as the session holds them after a JSON round-trip."""
+    rng = random.Random(seed)
+    questions = {axis_def["axis_name"]: flask_app.generate_questions(axis_def) for axis_def in flask_app.AXES_DEFINITIONS}
+    answers = {axis_name: {str(i): rng.choice(flask_app.LIKERT_SCALE) for i in range(len(axis_questions))}
+               for axis_name, axis_questions in questions.items()}
+    return questions, answers
+
+
+def build_benchmarks() -> dict:
+    """Returns {name: zero-argument callable}."""
+    app = flask_app.app
+    questions, answers = completed_quiz()
+    digests = {axis_def["axis_name"]: flask_app.generate_axis_digest(axis_def, questions[axis_def["axis_name"]],
+                                                                      answers[axis_def["axis_name"]])
+               for axis_def in flask_app.AXES_DEFINITIONS}
+    axes_data = flask_app.create_axes_data(answers)
+    session_data = {
+        "quiz_id": "0" * 32,
+        "current_axis_index": len(flask_app.AXES_DEFINITIONS),
+        "current_question_within_axis_index": 0,
+        "questions": questions,
+        "answers": answers,
+        "axis_digests": digests,
+    }
+    serializer = app.session_interface.get_signing_serializer(app)
+    session_cookie = serializer.dumps(session_data)
+    first_axis = flask_app.AXES_DEFINITIONS[0]
+    quiz_context = dict(category_name=first_axis["axis_name"], question_text=questions[first_axis["axis_name"]][0],
+                        likert_scale=flask_app.LIKERT_SCALE, current_q_num=1, total_questions=flask_app.TOTAL_QUESTIONS)
+    summary_context = dict(summary_text=flask_app.generate_summary(answers, questions, digests), axes_data=axes_data,
+                           result_id="0" * 20, summary_source="llm",
+                           archetype_matches=flask_app.archetype_matcher.match(axes_data) if flask_app.archetype_matcher else [])
+
+    def render(template, context):
+        with app.test_request_context("/"):
+            return render_template(template, **context)
+
+    return {
+        "generate_questions": lambda: flask_app.generate_questions(first_axis),
+        "format_axis_answers": lambda: flask_app.format_axis_answers(questions[first_axis["axis_name"]], answers[first_axis["axis_name"]]),
+        "generate_summary": lambda: flask_app.generate_summary(answers, questions, digests),
+        "create_axes_data": lambda: flask_app.create_axes_data(answers),
+        "session_dumps": lambda: serializer.dumps(session_data),
+        "session_loads": lambda: serializer.loads(session_cookie),
+        "render_quiz": lambda: render("quiz.html", quiz_context),
+        "render_summary": lambda: render("summary.html", summary_context),
+    }
+
+
+def calibrate_loops(func) -> int:
+    """Number of calls that makes one timing round last at least ROUND_SECONDS."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        if time.perf_counter() - start >= ROUND_SECONDS:
+            return loops
+        loops *= 2
+
+
+def measure_times(funcs: list, repeat: int) -> list:
+    """Best per-call time of each function over `repeat` rounds. The functions' rounds are interleaved,
+    so a slow spell on a shared machine affects them alike. The garbage collector is paused while
+    timing, as in timeit, so collections triggered by earlier benchmarks don't land on this one."""
+    loops = [calibrate_loops(func) for func in funcs]
+    best = [float("inf")] * len(funcs)
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            for i, func in enumerate(funcs):
+                start = time.perf_counter()
+                for _ in range(loops[i]):
+                    func()
+                best[i] = min(best[i], (time.perf_counter() - start) / loops[i])
+    finally:
+        gc.enable()
+    return best
+
+
+def reference_workload():
+    """Fixed pure-Python work timed next to every benchmark, to factor out the speed of the machine."""
+    return sorted(str(i * 7919 % 1009) for i in range(300))
+
+
+def measure_peak_memory(func) -> int:
+    """Peak bytes allocated while one call runs (warm caches, so steady-state allocations only)."""
+    func()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def load_baselines() -> dict:
+    try:
+        with open(BASELINES_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"benchmarks": {}}
+
+
+def compare(value: float, baseline, threshold: float, slack: float = 0.0) -> str:
+    if not baseline:
+        return "new"
+    change = value / baseline - 1
+    significant = abs(value - baseline) > slack
+    flag = "  REGRESSION" if change > threshold and significant else ("  faster" if change < -threshold and significant else "")
+    return f"{change:+.1%}{flag}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=25)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown / extra memory")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baselines")
+    args = parser.parse_args()
+
+    flask_app.model = MemoizedModel(SyntheticModel())
+    benchmarks = {name: func for name, func in build_benchmarks().items() if args.filter in name}
+    baselines = load_baselines()
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<20} {'time us':>10} {'vs base':>20} {'peak KiB':>10} {'vs base':>20}")
+    for name, func in benchmarks.items():
+        reference_s, time_s = measure_times([reference_workload, func], args.repeat)
+        reference_us, time_us = reference_s * 1e6, time_s * 1e6
+        peak_kib = measure_peak_memory(func) / 1024
+        results[name] = {"time_us": round(time_us, 2), "reference_us": round(reference_us, 2), "peak_kib": round(peak_kib, 1)}
+        baseline = baselines["benchmarks"].get(name, {})
+        # The baseline time as it would be on this machine right now
+        expected_us = baseline["time_us"] * reference_us / baseline["reference_us"] if baseline.get("reference_us") else None
+        time_change = compare(time_us, expected_us, args.threshold)
+        memory_change = compare(peak_kib, baseline.get("peak_kib"), args.threshold, MEMORY_SLACK_KIB)
+        if "REGRESSION" in time_change or "REGRESSION" in memory_change:
+            regressions.append(name)
+        print(f"{name:<20} {time_us:10.1f} {time_change:>20} {peak_kib:10.1f} {memory_change:>20}")
+
+    if baselines.get("python") and baselines["python"] != platform.python_version():
+        print(f"baselines were recorded on Python {baselines['python']}; interpreter changes move these numbers too")
+    if args.save:
+        baselines["benchmarks"].update(results)
+        baselines["python"] = platform.python_version()
+        with open(BASELINES_FILE, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baselines saved to {BASELINES_FILE}")
+    elif regressions:
+        print(f"regressions over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
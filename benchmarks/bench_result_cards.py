@@ -0,0 +1,86 @@
+"""Benchmark of result card rendering: render time and cache hit rate on simulated results.
+
+Usage: python benchmarks/bench_result_cards.py [--results 20000] [--seed 1] [--step 25] [--cache-size 4096]
+"""
+import os
+import sys
+import random
+import argparse
+import statistics
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (axis_name, pole_left, pole_right, questions) - mirrors AXES_DEFINITIONS without importing the app
+AXES = [
+    ("Polityka Gospodarcza", "Równość Społeczna", "Wolność Rynkowa", 14),
+    ("Polityka Społeczna", "Konserwatyzm", "Liberalizm", 14),
+    ("Polityka Narodowa", "Nacjonalizm", "Globalizm", 12),
+    ("Polityka Środowiskowa", "Rozwój", "Ekologizm", 8),
+    ("Władza i Porządek", "Wolność", "Bezpieczeństwo", 12),
+]
+
+
+def simulated_axes_data(rng: random.Random) -> list:
+    """One respondent: a latent position per axis plus per-answer noise, scored like create_axes_data."""
+    axes_data = []
+    for axis_name, pole_left, pole_right, num_questions in AXES:
+        lean = rng.gauss(3, 0.8)
+        answers = [min(5, max(1, round(rng.gauss(lean, 1)))) for _ in range(num_questions)]
+        average_score = sum(answers) / len(answers)
+        axes_data.append({
+            "axis_name": axis_name,
+            "pole_left": pole_left,
+            "pole_right": pole_right,
+            "value_percent": round(((average_score - 1) / 4) * 100, 1),
+        })
+    return axes_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--step", help="override CARD_QUANT_STEP")
+    parser.add_argument("--cache-size", help="override CARD_CACHE_SIZE")
+    args = parser.parse_args()
+    # The card module reads its settings at import time
+    if args.step:
+        os.environ["CARD_QUANT_STEP"] = args.step
+    if args.cache_size:
+        os.environ["CARD_CACHE_SIZE"] = args.cache_size
+    global result_cards
+    import result_cards
+
+    rng = random.Random(args.seed)
+    results = [simulated_axes_data(rng) for _ in range(args.results)]
+
+    # Cold render cost, bypassing the cache
+    cold_times = []
+    for axes_data in results[:500]:
+        start = time.perf_counter()
+        result_cards.render_card_svg.__wrapped__(result_cards.quantize_axes(axes_data))
+        cold_times.append(time.perf_counter() - start)
+
+    # Serving path: quantize + cached render
+    result_cards.render_card_svg.cache_clear()
+    serve_times = []
+    for axes_data in results:
+        start = time.perf_counter()
+        result_cards.render_card_svg(result_cards.quantize_axes(axes_data))
+        serve_times.append(time.perf_counter() - start)
+
+    stats = result_cards.card_cache_info()["svg"]
+    serve_sorted = sorted(serve_times)
+    print(f"results simulated:     {args.results}")
+    print(f"quantization step:     {result_cards.CARD_QUANT_STEP:g} pp, cache size {result_cards.CARD_CACHE_SIZE}")
+    print(f"cold render (uncached): mean {statistics.mean(cold_times) * 1e6:.1f} us, "
+          f"p95 {sorted(cold_times)[int(len(cold_times) * 0.95)] * 1e6:.1f} us")
+    print(f"served (cached):        mean {statistics.mean(serve_times) * 1e6:.1f} us, "
+          f"p50 {serve_sorted[len(serve_sorted) // 2] * 1e6:.1f} us, p95 {serve_sorted[int(len(serve_sorted) * 0.95)] * 1e6:.1f} us")
+    print(f"cache hits/misses:      {stats['hits']}/{stats['misses']} (hit rate {stats['hit_rate']:.1%}), "
+          f"{stats['size']} cards kept")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Streaming export of stored quiz results as NDJSON or CSV.
+
+Results are read one by one through the result store index, so memory use does not grow with the number of
+results. Exports can be paged with --limit / --cursor (the next cursor is printed to stderr).
+
+Usage:
+    python export_results.py --format csv --since 2026-01-01 --axis "Polityka Gospodarcza:0:40" > wyniki.csv
+    python export_results.py --format ndjson --limit 5000 --cursor 0 > strona1.ndjson
+    python export_results.py --rebuild-index
+"""
+import io
+import sys
+import csv
+import json
+import argparse
+import datetime
+
+from result_store import ResultStore
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+
+def parse_time(value: str):
+    """Parses an ISO date/time; naive values are taken as UTC."""
+    if not value:
+        return None
+    if value.endswith(("Z", "z")): # fromisoformat only accepts 'Z' from Python 3.11
+        value = value[:-1] + "+00:00"
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+
+def parse_axis_filter(value: str) -> tuple:
+    """Parses 'AXIS NAME:MIN:MAX' (value_percent bounds, inclusive; either bound may be empty)."""
+    axis_name, _, bounds = value.rpartition(":")
+    axis_name, _, low = axis_name.rpartition(":")
+    if not axis_name:
+        raise ValueError(f"Niepoprawny filtr osi: '{value}'. Oczekiwano 'NAZWA OSI:MIN:MAX'.")
+    return axis_name, float(low) if low else 0.0, float(bounds) if bounds else 100.0
+
+
+def _matches_axes(result: dict, axis_filters) -> bool:
+    values = {axis["axis_name"]: axis["value_percent"] for axis in result["axes_data"]}
+    return all(axis_name in values and low <= values[axis_name] <= high for axis_name, low, high in axis_filters)
+
+
+def iter_results(store: ResultStore, since=None, until=None, axis_filters=(), cursor: int = 0, end_cursor: int = None):
+    """Yields stored results between two index cursors that match the time range and axis filters."""
+    for created_at, result_id in store.iter_index(cursor, end_cursor):
+        try:
+            created = parse_time(created_at)
+        except ValueError:
+            continue # Cursor pointed into the middle of a line
+        if (since and created < since) or (until and created >= until):
+            continue # Checked on the index line, before the result file is read
+        result = store.get(result_id)
+        if result is not None and _matches_axes(result, axis_filters):
+            yield result
+
+
+def ndjson_rows(results):
+    for result in results:
+        yield json.dumps(result, ensure_ascii=False) + "\n"
+
+
+def csv_rows(results):
+    """One row per result: per-axis percentage and Likert answers (e.g. '5 4 3') plus the summary text.
+    The header is taken from the first result, so all rows share the axis layout of the current quiz."""
+    buffer = io.StringIO()
+    writer = None
+    for result in results:
+        row = {"result_id": result["result_id"], "created_at": result["created_at"]}
+        for axis in result["axes_data"]:
+            answers = result["answers"].get(axis["axis_name"], [])
+            row[f"{axis['axis_name']} [%]"] = axis["value_percent"]
+            row[f"{axis['axis_name']} [odpowiedzi]"] = " ".join(answer.split(":")[0] for answer in answers)
+        row["summary_text"] = result["summary_text"]
+        row["summary_source"] = result.get("summary_source", "llm")
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row), restval="", extrasaction="ignore")
+            writer.writeheader()
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def export_rows(fmt: str, results):
+    return ndjson_rows(results) if fmt == "ndjson" else csv_rows(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--since", help="ISO date/time (inclusive)")
+    parser.add_argument("--until", help="ISO date/time (exclusive)")
+    parser.add_argument("--axis", action="append", default=[], help="'AXIS NAME:MIN:MAX', may be repeated")
+    parser.add_argument("--cursor", type=int, default=0)
+    parser.add_argument("--limit", type=int, help="index entries to scan (page size)")
+    parser.add_argument("--results-dir", help="defaults to RESULTS_DIR")
+    parser.add_argument("--rebuild-index", action="store_true", help="recreate the index from the stored files")
+    args = parser.parse_args()
+
+    store = ResultStore(args.results_dir)
+    if args.rebuild_index:
+        print(f"Indexed {store.rebuild_index()} results.", file=sys.stderr)
+        return
+
+    try:
+        since, until = parse_time(args.since), parse_time(args.until)
+        axis_filters = [parse_axis_filter(value) for value in args.axis]
+    except ValueError as e:
+        parser.error(str(e))
+
+    end_cursor, has_more = store.advance_index(args.cursor, args.limit)
+    results = iter_results(store, since, until, axis_filters, args.cursor, end_cursor)
+    for chunk in export_rows(args.format, results):
+        sys.stdout.write(chunk)
+    print(f"next_cursor={end_cursor} has_more={str(has_more).lower()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
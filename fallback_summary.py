@@ -0,0 +1,59 @@
+import statistics
+
+# --- Local, template-based summary ---
+# Served when the model does not answer within the latency budget (or fails). Built only from the
+# create_axes_data() scores and simple answer patterns, so it is instant and deterministic.
+
+STRONG_LEAN = 20 # Percentage points from the 50% centre
+MODERATE_LEAN = 10
+
+
+def _lean(axis: dict):
+    """Returns (pole, distance from the centre) for one axis."""
+    offset = axis["value_percent"] - 50
+    return (axis["pole_right"] if offset > 0 else axis["pole_left"]), abs(offset)
+
+
+def build_fallback_summary(axes_data: list, answer_values_by_axis: dict, archetype_matches=()) -> str:
+    """Writes a short paragraph addressed to the user ('Ty').
+    answer_values_by_axis maps axis names to Likert values (1-5) of the answers."""
+    leans = sorted((_lean(axis) + (axis["axis_name"],) for axis in axes_data), key=lambda lean: -lean[1])
+    sentences = []
+
+    strong = [(pole, axis_name) for pole, distance, axis_name in leans if distance >= STRONG_LEAN]
+    moderate = [(pole, axis_name) for pole, distance, axis_name in leans if MODERATE_LEAN <= distance < STRONG_LEAN]
+    if strong:
+        pole, axis_name = strong[0]
+        sentences.append(f"Twoje odpowiedzi wskazują przede wszystkim na przywiązanie do wartości „{pole}” – "
+                         f"w obszarze „{axis_name}” Twoje stanowisko jest wyraźnie określone.")
+        others = strong[1:] + moderate
+    elif moderate:
+        pole, axis_name = moderate[0]
+        sentences.append(f"Twoje odpowiedzi układają się raczej umiarkowanie, z wyraźniejszym ciążeniem ku wartości „{pole}” "
+                         f"w obszarze „{axis_name}”.")
+        others = moderate[1:]
+    else:
+        sentences.append("Twoje odpowiedzi układają się blisko środka wszystkich osi, co sugeruje poszukiwanie równowagi "
+                         "i ostrożność wobec skrajnych rozwiązań.")
+        others = []
+    if others:
+        poles = ", ".join(f"„{pole}”" for pole, _ in others[:2])
+        sentences.append(f"Widać też skłonność ku wartościom takim jak {poles}.")
+
+    values = [value for axis_values in answer_values_by_axis.values() for value in axis_values]
+    if values:
+        extreme_share = sum(1 for value in values if value in (1, 5)) / len(values)
+        neutral_share = sum(1 for value in values if value == 3) / len(values)
+        if extreme_share >= 0.4:
+            sentences.append("Często wybierasz zdecydowane odpowiedzi, co świadczy o wyrazistych przekonaniach.")
+        elif neutral_share >= 0.35:
+            sentences.append("Dość często wybierasz odpowiedź „Nie mam zdania”, co może oznaczać ostrożność "
+                             "lub otwartość na różne argumenty.")
+        spreads = [statistics.pstdev(axis_values) for axis_values in answer_values_by_axis.values() if len(axis_values) > 1]
+        if spreads and statistics.mean(spreads) > 1.3:
+            sentences.append("W obrębie poszczególnych obszarów Twoje odpowiedzi bywają zróżnicowane, co wskazuje "
+                             "raczej na niuansowe podejście niż na jedną, sztywną linię.")
+
+    if archetype_matches:
+        sentences.append(f"Taki zestaw poglądów może sytuować Cię blisko nurtu: {archetype_matches[0]['name']}.")
+    return " ".join(sentences)
@@ -1,25 +1,56 @@
 import os
 import json
+import hashlib
 import datetime # Import datetime
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+import time
+import threading
+import uuid
+import hmac
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import Flask, render_template, request, redirect, url_for, session, flash, make_response, abort, Response, jsonify
 from dotenv import load_dotenv
 import google.generativeai as genai
 import plotly.graph_objects as go
 import plotly.io as pio # For converting Plotly fig to JSON
+from result_store import ResultStore, compute_result_id
+from result_cards import quantize_axes, card_etag, render_card_svg, render_card_png, png_cards_available
+from model_backends import create_model_backend
+from profiling import init_profiling, traced, span
+from app_logging import init_logging, get_logger, with_log_context
+from export_results import EXPORT_FORMATS, parse_time, parse_axis_filter, iter_results, export_rows
+from archetypes import ARCHETYPES_FILE, load_archetype_matcher
+from fallback_summary import build_fallback_summary
+import metrics
 
 # --- Initial Setup ---
 load_dotenv()
-API_KEY = os.getenv("GOOGLE_API_KEY")
-if not API_KEY:
-    raise ValueError("Nie znaleziono klucza API Google. Upewnij się, że plik .env istnieje i zawiera GOOGLE_API_KEY.")
-genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel('gemini-2.0-flash-lite') # Keep user-specified model
+log = get_logger("app")
+# gemini (default) | record | replay | synthetic - the last two run offline, see model_backends.py
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "gemini")
+gemini_model = None
+hedge_gemini_model = None
+if MODEL_BACKEND in ("gemini", "record"):
+    API_KEY = os.getenv("GOOGLE_API_KEY")
+    if not API_KEY:
+        raise ValueError("Nie znaleziono klucza API Google. Upewnij się, że plik .env istnieje i zawiera GOOGLE_API_KEY.")
+    genai.configure(api_key=API_KEY)
+    gemini_model = genai.GenerativeModel('gemini-2.0-flash-lite') # Keep user-specified model
+    if os.getenv("HEDGE_MODEL"):
+        # Alternate model for hedged requests, e.g. 'gemini-2.0-flash' (see HedgedModel)
+        hedge_gemini_model = genai.GenerativeModel(os.getenv("HEDGE_MODEL"))
+model = create_model_backend(MODEL_BACKEND, gemini_model, hedge_gemini_model)
 
 app = Flask(__name__)
 # IMPORTANT: Set a secret key for session management!
 # In a real app, use a strong, randomly generated key and store it securely.
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-key-replace-in-prod")
 
+# Opt-in sampling profiler (PROFILE_SAMPLE_RATE), see profiling.py
+init_profiling(app)
+
+# Request IDs and debug sampling for the structured logs (LOG_* variables), see app_logging.py
+init_logging(app)
+
 # --- Inject current year into template context ---
 @app.context_processor
 def inject_now():
@@ -123,8 +154,43 @@ AXES_DEFINITIONS = [
 # Calculate total questions based on the new structure (should be 60)
 TOTAL_QUESTIONS = sum(len(axis.get("sub_topics", [])) + axis.get("num_general_questions", 0) for axis in AXES_DEFINITIONS)
 
+# --- Incremental per-axis digests ---
+# Each finished axis except the last is summarised in the background while the user answers the next one,
+# so the final summary combines four short digests plus the raw answers of the last axis in one model call.
+DIGEST_WORKERS = int(os.getenv("DIGEST_WORKERS", "4"))
+DIGEST_TTL = float(os.getenv("DIGEST_TTL", "3600")) # Seconds before digests of an abandoned quiz are dropped
+digest_executor = ThreadPoolExecutor(max_workers=DIGEST_WORKERS, thread_name_prefix="axis-digest")
+_pending_digests = {} # {(quiz_id, axis_name): (Future, scheduled_at)}, oldest first
+_pending_digests_lock = threading.Lock()
+
+# --- Stored results ---
+result_store = ResultStore()
+RESULT_CACHE_MAX_AGE = int(os.getenv("RESULT_CACHE_MAX_AGE", str(7 * 24 * 3600))) # Result cards are immutable
+RESULT_PAGE_MAX_AGE = int(os.getenv("RESULT_PAGE_MAX_AGE", "3600")) # Result pages change with the app
+# Summaries starting with these messages are failures and must not be persisted
+SUMMARY_FAILURE_PREFIXES = ("Nie udało się wygenerować", "Wystąpił błąd podczas generowania")
+
+# --- Summary latency budget ---
+# If the model hasn't answered within the budget, /summary serves a local fallback summary at once
+# and the model's summary replaces it in the stored result when it arrives.
+SUMMARY_LATENCY_BUDGET = float(os.getenv("SUMMARY_LATENCY_BUDGET", "8")) # Seconds
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "8"))
+summary_executor = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="summary")
+_pending_summaries = {} # {result_id: Future} of model summaries still running
+_pending_summaries_lock = threading.Lock()
+metrics.describe("summary_served_total", "Summaries shown on first generation, by source (llm/fallback) and fallback reason.")
+metrics.describe("summary_upgrades_total", "Fallback summaries later replaced by the model's summary.")
+
+# --- Reference profiles for nearest-archetype matching (see archetypes.json) ---
+archetype_matcher = load_archetype_matcher()
+
+# --- Analyst export (disabled unless EXPORT_TOKEN is set) ---
+EXPORT_TOKEN = os.getenv("EXPORT_TOKEN")
+EXPORT_MAX_PAGE = int(os.getenv("EXPORT_MAX_PAGE", "10000")) # Index entries per page
+
 # --- Helper Functions (Adapted from Gradio app) ---
 
+@traced("generate_questions")
 def generate_questions(axis_definition: dict) -> list[str]:
     """Generates diverse & specific questions for sub-topics and general axis concepts, oriented towards poles."""
     axis_name = axis_definition["axis_name"]
@@ -165,43 +231,140 @@ def generate_questions(axis_definition: dict) -> list[str]:
 
     prompt = "\n".join(prompt_parts)
 
-    print(f"--- Generating {total_axis_questions} questions for axis: {axis_name} (Diverse & Specific Prompt) ---")
-    # print(f"--- Prompt Start ---\n{prompt}\n--- Prompt End ---") # Uncomment for debugging prompt
+    log.info("questions_generating", axis=axis_name, count=total_axis_questions)
+    log.debug("questions_prompt", axis=axis_name, prompt=prompt)
 
     try:
         response = model.generate_content(prompt)
         questions = [q.strip().lstrip('- ').lstrip('* ') for q in response.text.strip().split('\n') if q.strip()]
         if len(questions) != total_axis_questions:
-            print(f"Warning: LLM returned {len(questions)} questions instead of {total_axis_questions} for {axis_name}.")
+            log.warning("questions_count_mismatch", axis=axis_name, expected=total_axis_questions, returned=len(questions))
             questions = questions[:total_axis_questions]
             while len(questions) < total_axis_questions:
                 questions.append(f"Placeholder - Generation Error {len(questions)+1} for {axis_name}")
-        print(f"--- Generated {len(questions)} questions for {axis_name} ---")
+        log.info("questions_generated", axis=axis_name, count=len(questions))
         return questions
     except Exception as e:
-        print(f"Error generating questions for {axis_name}: {e}")
+        log.exception("questions_failed", axis=axis_name, error=e)
         return [f"API Error - question {i+1} ({axis_name})" for i in range(total_axis_questions)]
 
-def generate_summary(answers_by_index: dict) -> str:
-    """Generates a synthesized, personalized summary as a single block of text based on deep analysis."""
-    print("--- Generating summary (Flowing Narrative Prompt) --- ")
-    formatted_answers_for_prompt = ""
-    questions_from_session = session.get('questions', {}) # Get questions
-    for axis_name, indexed_answers in answers_by_index.items():
-        formatted_answers_for_prompt += f"Oś: {axis_name}\n"
-        axis_questions = questions_from_session.get(axis_name, [])
-        for q_idx, answer_text in sorted(indexed_answers.items()):
-            answer_value = LIKERT_SCALE_VALUES.get(str(answer_text), "Unknown")
-            question_text = axis_questions[q_idx] if q_idx < len(axis_questions) else f"(Pytanie {q_idx+1})"
-            formatted_answers_for_prompt += f"  Pytanie {q_idx+1}: Odpowiedź {answer_value} ({answer_text}) - {question_text[:50]}...\n" 
-        formatted_answers_for_prompt += "\n"
+def format_axis_answers(axis_questions: list, indexed_answers: dict) -> str:
+    """Formats the answers of a single axis as prompt lines ('Pytanie N: Odpowiedź X (...) - ...')."""
+    formatted = ""
+    # Indices may come back as strings after a JSON session round-trip
+    for q_idx, answer_text in sorted(indexed_answers.items(), key=lambda item: int(item[0])):
+        q_idx = int(q_idx)
+        answer_value = LIKERT_SCALE_VALUES.get(str(answer_text), "Unknown")
+        question_text = axis_questions[q_idx] if q_idx < len(axis_questions) else f"(Pytanie {q_idx+1})"
+        formatted += f"  Pytanie {q_idx+1}: Odpowiedź {answer_value} ({answer_text}) - {question_text[:50]}...\n"
+    return formatted
+
+def generate_axis_digest(axis_definition: dict, axis_questions: list, indexed_answers: dict) -> str:
+    """Generates a short digest of the user's stance on one axis. Safe to call outside a request."""
+    axis_name = axis_definition["axis_name"]
+    formatted_answers = format_axis_answers(axis_questions, indexed_answers)
+    prompt = f"""
+Przeanalizuj odpowiedzi użytkownika dotyczące osi '{axis_name}' ('{axis_definition["pole_left"]}' vs '{axis_definition["pole_right"]}'), skala 1-5 (1=Zdecydowanie się nie zgadzam, 5=Zdecydowanie się zgadzam, ZGODA oznacza poparcie dla bieguna '{axis_definition["pole_right"]}').
+
+Odpowiedzi:
+{formatted_answers}
+Napisz **zwięzłą notatkę analityczną** (2-3 zdania, maks. 60 słów) opisującą dominującą postawę użytkownika na tej osi, jej siłę i spójność oraz ewentualne wewnętrzne napięcia. Notatka posłuży jako materiał do końcowego podsumowania, nie zwracaj się do użytkownika.
+
+Zwróć **TYLKO tekst notatki**.
+"""
+    log.info("digest_generating", axis=axis_name)
+    try:
+        response = model.generate_content(prompt)
+        digest_text = response.text.strip()
+        if digest_text:
+            return digest_text
+        log.warning("digest_empty", axis=axis_name)
+    except Exception as e:
+        log.exception("digest_failed", axis=axis_name, error=e)
+    # Fall back to the raw answers so the final summary still sees this axis
+    return f"Odpowiedzi (skala 1-5):\n{formatted_answers}"
+
+def schedule_axis_digest(quiz_id: str, axis_definition: dict, axis_questions: list, indexed_answers: dict):
+    """Starts generating the digest of a finished axis in the background."""
+    key = (quiz_id, axis_definition["axis_name"])
+    # Copy the session data - the session object must not be touched from worker threads
+    future = digest_executor.submit(with_log_context(generate_axis_digest), axis_definition, list(axis_questions), dict(indexed_answers))
+    now = time.monotonic()
+    with _pending_digests_lock:
+        # Entries of quizzes that never reach /summary are only removed here, once they are DIGEST_TTL old
+        for old_key, (old_future, scheduled_at) in list(_pending_digests.items()):
+            if now - scheduled_at < DIGEST_TTL:
+                break
+            del _pending_digests[old_key]
+            old_future.cancel()
+        _pending_digests.pop(key, None) # Re-inserted at the end to keep the dict ordered by age
+        _pending_digests[key] = (future, now)
+
+def collect_axis_digests() -> dict:
+    """Moves finished background digests of the current quiz into the session and returns all cached digests."""
+    quiz_id = session.get('quiz_id')
+    session_digests = session.get('axis_digests', {})
+    if not quiz_id:
+        return session_digests
+    with _pending_digests_lock:
+        own_futures = {key: future for key, (future, _) in _pending_digests.items() if key[0] == quiz_id}
+    updated = False
+    for key, future in own_futures.items():
+        if not future.done():
+            continue
+        session_digests[key[1]] = future.result()
+        with _pending_digests_lock:
+            _pending_digests.pop(key, None)
+        updated = True
+    if updated:
+        session['axis_digests'] = session_digests
+    return session_digests
+
+def take_pending_axis_digests() -> dict:
+    """Hands the still-running digests of the current quiz over to the caller as {axis_name: Future}."""
+    quiz_id = session.get('quiz_id')
+    with _pending_digests_lock:
+        own_keys = [key for key in _pending_digests if key[0] == quiz_id]
+        return {key[1]: _pending_digests.pop(key)[0] for key in own_keys}
+
+def discard_axis_digests(quiz_id: str):
+    """Drops background digests of an abandoned quiz."""
+    with _pending_digests_lock:
+        for key in [key for key in _pending_digests if key[0] == quiz_id]:
+            _pending_digests.pop(key)[0].cancel()
+
+@traced("generate_summary")
+def generate_summary(answers_by_index: dict, questions_by_axis: dict, digests: dict, pending_digests: dict = None) -> str:
+    """Generates a synthesized, personalized summary as a single block of text based on the per-axis digests.
+    Doesn't touch the session, so it can run in the background (see start_summary_generation)."""
+    log.info("summary_generating")
+    pending_digests = pending_digests or {}
+    formatted_digests_for_prompt = ""
+    for axis_def in AXES_DEFINITIONS:
+        axis_name = axis_def["axis_name"]
+        indexed_answers = answers_by_index.get(axis_name)
+        if not indexed_answers:
+            continue
+        pending = pending_digests.get(axis_name)
+        if axis_name in digests:
+            digest = digests[axis_name]
+        elif pending is not None and pending.done() and not pending.cancelled() and pending.exception() is None:
+            digest = pending.result()
+        else:
+            # Last axis (never digested), or a digest still running or never scheduled in this process - use
+            # the raw answers instead of waiting, so the summary stays a single model call. A queued digest is
+            # cancelled; a running one finishes and its result is discarded.
+            if pending is not None:
+                pending.cancel()
+            digest = f"Odpowiedzi (skala 1-5):\n{format_axis_answers(questions_by_axis.get(axis_name, []), indexed_answers)}"
+        formatted_digests_for_prompt += f"Oś: {axis_name} ('{axis_def['pole_left']}' vs '{axis_def['pole_right']}')\n{digest}\n\n"
 
     # Revised prompt for a flowing, consistent narrative summary
     prompt = f"""
-Przeanalizuj **dogłębnie** poniższe odpowiedzi użytkownika (skala 1-5, 1=Zdecydowanie się nie zgadzam, 5=Zdecydowanie się zgadzam), szukając **najbardziej dominujących i spójnych wzorców myślenia, wartości oraz ewentualnych wewnętrznych napięć**.
+Przeanalizuj **dogłębnie** poniższe cząstkowe analizy odpowiedzi użytkownika na poszczególnych osiach (skala 1-5, 1=Zdecydowanie się nie zgadzam, 5=Zdecydowanie się zgadzam), szukając **najbardziej dominujących i spójnych wzorców myślenia, wartości oraz ewentualnych wewnętrznych napięć**.
 
-Odpowiedzi:
-{formatted_answers_for_prompt}
+Analizy osi:
+{formatted_digests_for_prompt}
 
 Twoim zadaniem jest napisanie **spersonalizowanego, płynnego podsumowania** (ok. 120-180 słów) w formie **JEDNEGO AKAPITU**, które trafnie opisuje profil polityczny użytkownika. Pisz bezpośrednio do użytkownika ('Ty', 'Twoje').
 
@@ -223,16 +386,16 @@ Zwróć **TYLKO gotowy tekst podsumowania** jako jeden akapit.
         
         # Basic checks
         if not summary_text or len(summary_text) < 30: 
-            print("Warning: Summary seems too short or empty.")
+            log.warning("summary_too_short", chars=len(summary_text))
             return "Nie udało się wygenerować poprawnego podsumowania. Spróbuj ponownie."
         
         # Check for axis names (still potentially useful check)
         if any(axis_def["axis_name"] in summary_text for axis_def in AXES_DEFINITIONS):
-             print("Warning: Summary might still contain axis names despite instructions.")
+             log.warning("summary_mentions_axis")
         
         # Check for unwanted preamble (optional but potentially useful)
         if summary_text.lower().startswith("oto podsumowanie") or summary_text.lower().startswith("analiza twoich"):
-            print("Warning: Summary seems to start with a preamble.")
+            log.warning("summary_preamble")
             # Attempt to remove common preambles (simple approach)
             lines = summary_text.split('\n')
             if len(lines) > 1 and (lines[0].lower().startswith("oto") or lines[0].lower().startswith("analiza")):
@@ -240,12 +403,13 @@ Zwróć **TYLKO gotowy tekst podsumowania** jako jeden akapit.
 
         return summary_text
     except Exception as e:
-        print(f"Error generating summary: {e}")
+        log.exception("summary_failed", error=e)
         return f"Wystąpił błąd podczas generowania podsumowania: {e}"
 
+@traced("create_axes_data")
 def create_axes_data(answers_by_index: dict) -> list:
     """Calculates scores from answers stored by index."""
-    print("--- Creating axes data (from indexed answers) --- ")
+    log.debug("axes_scoring", axes=len(answers_by_index))
     axes_results = []
     for axis_def in AXES_DEFINITIONS:
         axis_name = axis_def["axis_name"]
@@ -259,7 +423,7 @@ def create_axes_data(answers_by_index: dict) -> list:
         }
 
         if not indexed_answers:
-            print(f"Warning: No indexed answers found for axis {axis_name}.")
+            log.warning("axis_without_answers", axis=axis_name)
             axes_results.append(axis_result) # Append default 50%
             continue
 
@@ -270,35 +434,83 @@ def create_axes_data(answers_by_index: dict) -> list:
             if value is not None:
                 cat_values.append(value)
             else:
-                print(f"Warning: Invalid answer '{answer_text}' for axis {axis_name}.")
+                log.warning("answer_invalid", axis=axis_name, answer=answer_text)
         
         if cat_values:
              average_score = sum(cat_values) / len(cat_values)
              value_percent = max(0, min(100, ((average_score - 1) / 4) * 100))
              axis_result["value_percent"] = round(value_percent, 1)
-             print(f"Axis: {axis_name}, Avg Score: {average_score:.2f}, Percent: {value_percent:.1f}%")
+             log.debug("axis_scored", axis=axis_name, avg_score=round(average_score, 2), percent=round(value_percent, 1))
         else:
-             print(f"Warning: No valid numeric answers for axis {axis_name}.")
+             log.warning("axis_without_valid_answers", axis=axis_name)
         
         axes_results.append(axis_result)
 
     return axes_results
 
+def answer_values_by_axis(answers_by_index: dict) -> dict:
+    """Converts stored answer texts to Likert values: {axis_name: [1-5, ...]}."""
+    return {axis_name: [LIKERT_SCALE_VALUES[str(answer)] for answer in indexed_answers.values() if str(answer) in LIKERT_SCALE_VALUES]
+            for axis_name, indexed_answers in answers_by_index.items()}
+
+def is_failed_summary(summary_text: str) -> bool:
+    return not summary_text or summary_text.startswith(SUMMARY_FAILURE_PREFIXES)
+
+def store_model_summary(result_id: str, answers_by_index: dict, questions_by_axis: dict, axes_data: list, summary_text: str):
+    """Persists the model's summary, upgrading a fallback stored in the meantime. Returns None for failed summaries."""
+    if is_failed_summary(summary_text):
+        return None
+    stored_result = result_store.save(result_id, answers_by_index, questions_by_axis, axes_data, summary_text)
+    if stored_result.get('summary_source') == 'fallback':
+        stored_result = result_store.upgrade_summary(result_id, summary_text)
+        metrics.inc("summary_upgrades_total")
+        log.info("summary_upgraded", result_id=result_id)
+    return stored_result
+
+def start_summary_generation(result_id: str, answers_by_index: dict, questions_by_axis: dict, axes_data: list):
+    """Starts the model summary of a result in the background (or joins the one already running).
+    The summary is stored when it arrives, whether or not the request is still waiting for it."""
+    with _pending_summaries_lock:
+        future = _pending_summaries.get(result_id)
+        if future is not None:
+            return future
+        future = summary_executor.submit(with_log_context(generate_summary), answers_by_index, questions_by_axis,
+                                         dict(collect_axis_digests()), take_pending_axis_digests())
+        _pending_summaries[result_id] = future
+
+    def _store_when_done(done_future):
+        with _pending_summaries_lock:
+            _pending_summaries.pop(result_id, None)
+        try:
+            store_model_summary(result_id, answers_by_index, questions_by_axis, axes_data, done_future.result())
+        except Exception as e:
+            log.exception("summary_store_failed", result_id=result_id, error=e)
+
+    # Runs on the summary worker; keeps the request and session IDs of the request that started it
+    future.add_done_callback(with_log_context(_store_when_done))
+    return future
+
 # --- Flask Routes ---
 
 @app.route('/')
 def index():
+    if 'quiz_id' in session:
+        discard_axis_digests(session['quiz_id'])
     session.clear()
     return render_template('index.html', total_questions=TOTAL_QUESTIONS)
 
 @app.route('/start', methods=['POST'])
 def start():
+    if 'quiz_id' in session:
+        discard_axis_digests(session['quiz_id'])
+    session['quiz_id'] = uuid.uuid4().hex # Identifies this run's background digests
     session['current_axis_index'] = 0
     session['current_question_within_axis_index'] = 0
     session['questions'] = {} # {axis_name: [q1, q2...]}
     # *** Store answers by index ***
     session['answers'] = {} # {axis_name: {question_index: answer_text}}
-    print("--- Quiz started, session initialized --- ")
+    session['axis_digests'] = {} # {axis_name: digest_text}, filled as axes are completed
+    log.info("quiz_started")
     return redirect(url_for('quiz'))
 
 @app.route('/quiz')
@@ -314,6 +526,9 @@ def quiz():
     if axis_idx >= len(AXES_DEFINITIONS):
         return redirect(url_for('summary'))
 
+    # Pick up digests of previous axes that finished in the background
+    collect_axis_digests()
+
     current_axis_def = AXES_DEFINITIONS[axis_idx]
     axis_name = current_axis_def["axis_name"]
     # Calculate expected number of questions for this specific axis
@@ -321,13 +536,13 @@ def quiz():
 
     # Generate questions if not already generated
     if axis_name not in session.get('questions', {}):
-        print(f"--- Generating questions for axis {axis_name} on the fly ---")
+        log.info("quiz_axis_started", axis=axis_name)
         # Pass the full definition including sub_topics and num_general_questions
         generated_q = generate_questions(current_axis_def)
 
         # Ensure the correct number of questions were generated (including placeholders)
         if len(generated_q) != num_questions_for_this_axis:
-            print(f"Error: Mismatch in expected ({num_questions_for_this_axis}) vs generated ({len(generated_q)}) question count for {axis_name}")
+            log.error("questions_count_invalid", axis=axis_name, expected=num_questions_for_this_axis, generated=len(generated_q))
             # Handle this critical error - maybe flash message and redirect?
             flash(f"Krytyczny błąd podczas generowania pytań dla osi: {axis_name}.", "error")
             session.clear()
@@ -395,7 +610,7 @@ def answer():
         # Use the index q_within_axis_idx as the key
         session_answers[axis_name][q_within_axis_idx] = user_answer
         session['answers'] = session_answers
-        print(f"Stored answer for {axis_name}[{q_within_axis_idx}]: {user_answer}")
+        log.debug("answer_stored", axis=axis_name, question=q_within_axis_idx, answer=user_answer)
     except (KeyError, IndexError):
         flash("Wystąpił błąd podczas zapisywania odpowiedzi. Spróbuj ponownie.", "error")
         return redirect(url_for('quiz'))
@@ -408,34 +623,198 @@ def answer():
     if next_q_within_axis_idx >= num_questions_for_this_axis:
         next_q_within_axis_idx = 0
         next_axis_idx += 1
+        # Axis complete - digest it in the background while the next axis is answered. The last axis is
+        # not digested: /summary follows immediately, so its digest could never finish in time
+        if 'quiz_id' in session and next_axis_idx < len(AXES_DEFINITIONS):
+            schedule_axis_digest(session['quiz_id'], current_axis_def,
+                                 session.get('questions', {}).get(axis_name, []),
+                                 session['answers'][axis_name])
 
     # Update session state
     session['current_axis_index'] = next_axis_idx
     session['current_question_within_axis_index'] = next_q_within_axis_idx
 
     if next_axis_idx >= len(AXES_DEFINITIONS):
-        print("--- Quiz finished, redirecting to summary --- ")
+        log.info("quiz_finished")
         return redirect(url_for('summary'))
     else:
         return redirect(url_for('quiz'))
 
+def _render_version() -> str:
+    """Hash of what a result page is rendered from besides the result: the deployed commit, templates
+    and archetype table. Part of the page's ETag, so a deploy doesn't keep answering 304 with old pages."""
+    digest = hashlib.sha256(os.getenv("RENDER_GIT_COMMIT", "").encode())
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    for path in (os.path.join(template_dir, 'base.html'), os.path.join(template_dir, 'summary.html'), ARCHETYPES_FILE):
+        try:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            pass
+    return digest.hexdigest()[:8]
+
+RENDER_VERSION = _render_version()
+
+def result_page_etag(result_id: str) -> str:
+    """ETag of a rendered result page; the footer year changes it too."""
+    return f"{result_id}-{RENDER_VERSION}-{datetime.datetime.now().year}"
+
+def render_result(result: dict, public: bool):
+    """Renders a stored result with caching headers; answers conditional GETs with 304."""
+    response = make_response(render_template('summary.html',
+                                             summary_text=result['summary_text'],
+                                             axes_data=result['axes_data'], # Pass the list directly
+                                             result_id=result.get('result_id'),
+                                             summary_source=result.get('summary_source', 'llm'),
+                                             card_png_available=png_cards_available(),
+                                             archetype_matches=archetype_matcher.match(result['axes_data']) if archetype_matcher else []
+                                             ))
+    if result.get('result_id') and result.get('summary_source') == 'fallback':
+        # The summary may still be upgraded, so caches have to revalidate
+        response.set_etag(f"{result_page_etag(result['result_id'])}-fallback")
+        response.cache_control.no_cache = True
+        response.cache_control.private = not public
+    elif result.get('result_id') and public:
+        # Not immutable: the result is, but the page around it changes on deploy (see RENDER_VERSION)
+        response.set_etag(result_page_etag(result['result_id']))
+        response.cache_control.max_age = RESULT_PAGE_MAX_AGE
+        response.cache_control.public = True
+    elif result.get('result_id'):
+        # /summary is one URL for every quiz of the session, so the browser must revalidate (a cheap 304
+        # while the result is unchanged); shared caches must not store it at all
+        response.set_etag(result_page_etag(result['result_id']))
+        response.cache_control.no_cache = True
+        response.cache_control.private = True
+    else:
+        response.cache_control.no_store = True
+    return response.make_conditional(request)
+
 @app.route('/summary')
 def summary():
-    """Display the summary page."""
+    """Display the summary page, generating and storing the result on the first visit only.
+    Waits for the model at most SUMMARY_LATENCY_BUDGET seconds, then serves a local fallback summary."""
     if 'answers' not in session or not session['answers']:
         flash("Brak odpowiedzi do wygenerowania podsumowania. Rozpocznij quiz ponownie.", "warning")
         return redirect(url_for('index'))
 
-    # Generate text summary
-    summary_text = generate_summary(session['answers'])
+    questions_by_axis = session.get('questions', {})
+    result_id = compute_result_id(session['answers'], questions_by_axis)
+    result = result_store.get(result_id)
+    if result is not None:
+        log.info("result_reused", result_id=result_id, summary_source=result.get('summary_source', 'llm'))
+        if result.get('summary_source') == 'fallback':
+            # Joins the upgrade still running, or retries one that was lost (failed call, worker restart)
+            start_summary_generation(result_id, session['answers'], questions_by_axis, result['axes_data'])
+        return render_result(result, public=False)
 
     # Generate axes data (list of dicts)
     axes_data = create_axes_data(session['answers']) # Changed function name and return type
 
-    return render_template('summary.html',
-                           summary_text=summary_text,
-                           axes_data=axes_data # Pass the list directly
-                           )
+    # Generate text summary in the background, waiting at most the latency budget
+    future = start_summary_generation(result_id, session['answers'], questions_by_axis, axes_data)
+    try:
+        with span("generate_summary"):
+            summary_text = future.result(timeout=SUMMARY_LATENCY_BUDGET)
+    except FutureTimeoutError:
+        summary_text = None
+    except Exception as e:
+        log.exception("summary_failed", result_id=result_id, error=e)
+        summary_text = ""
+
+    if summary_text is not None and not is_failed_summary(summary_text):
+        metrics.inc("summary_served_total", source="llm")
+        result = store_model_summary(result_id, session['answers'], questions_by_axis, axes_data, summary_text)
+        return render_result(result, public=False)
+
+    fallback_text = build_fallback_summary(axes_data, answer_values_by_axis(session['answers']),
+                                           archetype_matcher.match(axes_data) if archetype_matcher else [])
+    if summary_text is None:
+        log.info("summary_over_budget", result_id=result_id, budget_s=SUMMARY_LATENCY_BUDGET)
+        metrics.inc("summary_served_total", source="fallback", reason="timeout")
+        result = result_store.save(result_id, session['answers'], questions_by_axis, axes_data, fallback_text, summary_source='fallback')
+        return render_result(result, public=False)
+
+    # The model failed - show the fallback without persisting it, so the next visit retries the model
+    metrics.inc("summary_served_total", source="fallback", reason="error")
+    return render_result({'summary_text': fallback_text, 'axes_data': axes_data, 'summary_source': 'fallback'}, public=False)
+
+@app.route('/result/<result_id>')
+def result(result_id):
+    """Shareable permalink of a stored result. Never calls the model."""
+    stored_result = result_store.get(result_id)
+    if stored_result is None:
+        abort(404)
+    return render_result(stored_result, public=True)
+
+@app.route('/result/<result_id>/summary.json')
+def result_summary(result_id):
+    """Current summary of a stored result; polled by the page while a fallback summary is shown."""
+    stored_result = result_store.get(result_id)
+    if stored_result is None:
+        abort(404)
+    response = jsonify(summary_text=stored_result['summary_text'], summary_source=stored_result.get('summary_source', 'llm'))
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Counters of this worker process in the Prometheus text format."""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/result/<result_id>/card.<ext>')
+def result_card(result_id, ext):
+    """Shareable image of the axis bars (SVG, or PNG when cairosvg is installed)."""
+    stored_result = result_store.get(result_id)
+    if stored_result is None or ext not in ('svg', 'png'):
+        abort(404)
+    card_key = quantize_axes(stored_result['axes_data'])
+    if ext == 'png':
+        body = render_card_png(card_key)
+        if body is None:
+            return redirect(url_for('result_card', result_id=result_id, ext='svg'))
+        response = make_response(body)
+        response.mimetype = 'image/png'
+    else:
+        response = make_response(render_card_svg(card_key))
+        response.mimetype = 'image/svg+xml'
+    response.set_etag(card_etag(card_key))
+    response.cache_control.public = True
+    response.cache_control.max_age = RESULT_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+@app.route('/export/results.<fmt>')
+def export(fmt):
+    """Streams stored results as NDJSON or CSV, one page of the result index per request.
+    Requires 'Authorization: Bearer <EXPORT_TOKEN>'. The next page is given in X-Next-Cursor / Link."""
+    if not EXPORT_TOKEN or fmt not in EXPORT_FORMATS:
+        abort(404)
+    provided_token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not hmac.compare_digest(provided_token.encode(), EXPORT_TOKEN.encode()):
+        abort(401)
+    try:
+        since = parse_time(request.args.get('since'))
+        until = parse_time(request.args.get('until'))
+        axis_filters = [parse_axis_filter(value) for value in request.args.getlist('axis')]
+        cursor = int(request.args.get('cursor', 0))
+        limit = min(int(request.args.get('limit', EXPORT_MAX_PAGE)), EXPORT_MAX_PAGE)
+    except ValueError:
+        abort(400)
+    if cursor < 0 or limit < 1:
+        abort(400)
+
+    # The end of the page is fixed up front, so results saved during the export land on the next page
+    end_cursor, has_more = result_store.advance_index(cursor, limit)
+    rows = export_rows(fmt, iter_results(result_store, since, until, axis_filters, cursor, end_cursor))
+    response = Response(rows, mimetype='application/x-ndjson' if fmt == 'ndjson' else 'text/csv')
+    response.headers['X-Next-Cursor'] = str(end_cursor)
+    response.headers['X-Has-More'] = 'true' if has_more else 'false'
+    if has_more:
+        next_args = request.args.to_dict(flat=False)
+        next_args['cursor'] = end_cursor
+        response.headers['Link'] = f'<{url_for("export", fmt=fmt, _external=True, **next_args)}>; rel="next"'
+    response.cache_control.no_store = True
+    return response
 
 if __name__ == '__main__':
     # Remove debug run for production deployment
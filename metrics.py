@@ -0,0 +1,41 @@
+import threading
+from collections import defaultdict
+
+# --- In-process counters ---
+# Simple thread-safe counters exposed at /metrics in the Prometheus text format.
+# Values are per worker process; the scraper (or a sum over workers) aggregates them.
+
+_counters = defaultdict(float) # {(name, ((label, value), ...)): value}
+_help = {}
+_lock = threading.Lock()
+
+
+def describe(name: str, help_text: str):
+    _help[name] = help_text
+
+
+def inc(name: str, value: float = 1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] += value
+
+
+def get(name: str, **labels) -> float:
+    with _lock:
+        return _counters.get((name, tuple(sorted(labels.items()))), 0.0)
+
+
+def render_prometheus() -> str:
+    with _lock:
+        items = sorted(_counters.items())
+    lines = []
+    described = set()
+    for (name, labels), value in items:
+        if name not in described:
+            described.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} counter")
+        label_text = ",".join(f'{label}="{label_value}"' for label, label_value in labels)
+        lines.append(f"{name}{{{label_text}}} {value:g}" if label_text else f"{name} {value:g}")
+    return "\n".join(lines) + "\n"
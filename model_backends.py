@@ -0,0 +1,385 @@
+import os
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import metrics
+from app_logging import get_logger
+
+# --- Pluggable model backends ---
+# Everything the app needs from a model is `generate_content(prompt).text`. Besides the real Gemini
+# model this module provides offline stand-ins, selected with MODEL_BACKEND:
+#   gemini    - the real model (default)
+#   record    - the real model, every response appended to MODEL_CASSETTE
+#   replay    - responses read back from MODEL_CASSETTE, no network
+#   synthetic - deterministic generated Polish statements, digests and summaries, no network
+# Any backend can additionally be wrapped with latency and fault injection (FAKE_* variables),
+# and hedged against an alternate model (HEDGE_* variables, see HedgedModel).
+
+log = get_logger("model_backends")
+
+
+class FakeResponse:
+    """Minimal stand-in for a Gemini response object."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class InjectedFault(Exception):
+    """Raised by FaultInjectingModel to simulate an upstream API error."""
+
+
+def prompt_kind(prompt: str) -> str:
+    """Classifies app prompts: 'questions', 'digest' or 'summary'."""
+    if "wygeneruj łącznie" in prompt:
+        return "questions"
+    if "notatkę analityczną" in prompt:
+        return "digest"
+    return "summary"
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+# --- Record / replay ---
+
+class RecordingModel:
+    """Passes calls through to a real model and appends each response to a JSONL cassette."""
+
+    def __init__(self, inner, cassette_path: str):
+        self.inner = inner
+        self.cassette_path = cassette_path
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        response = self.inner.generate_content(prompt, **kwargs)
+        record = {"kind": prompt_kind(prompt), "prompt_sha256": prompt_hash(prompt), "text": response.text}
+        with self._lock:
+            with open(self.cassette_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return response
+
+
+class ReplayModel:
+    """Replays recorded responses: the exact prompt if it was recorded, otherwise the next one of the same kind."""
+
+    def __init__(self, cassette_path: str):
+        self.by_hash = {}
+        self.by_kind = {}
+        with open(cassette_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                self.by_hash[record["prompt_sha256"]] = record["text"]
+                self.by_kind.setdefault(record["kind"], []).append(record["text"])
+        self._counters = {kind: 0 for kind in self.by_kind}
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        text = self.by_hash.get(prompt_hash(prompt))
+        if text is None:
+            kind = prompt_kind(prompt)
+            recorded = self.by_kind.get(kind)
+            if not recorded:
+                raise LookupError(f"Cassette has no recorded '{kind}' responses")
+            with self._lock:
+                text = recorded[self._counters[kind] % len(recorded)]
+                self._counters[kind] += 1
+        return FakeResponse(text)
+
+
+# --- Synthetic responses ---
+
+_AXIS_PATTERN = re.compile(r"osi politycznej '(.+?)' \('(.+?)' vs '(.+?)'\)")
+_COUNT_PATTERN = re.compile(r"wygeneruj łącznie (\d+)")
+_ANSWER_VALUE_PATTERN = re.compile(r"Odpowiedź (\d)")
+
+_GENERAL_TEMPLATES = [
+    "W sprawach osi „{axis}” wartość „{right}” powinna mieć pierwszeństwo przed wartością „{left}”.",
+    "Nawet jeśli wiąże się to z kosztami, państwo powinno kierować się zasadą „{right}”, a nie „{left}”.",
+    "Postulaty kojarzone z hasłem „{left}” zbyt często hamują rozwiązania zgodne z hasłem „{right}”.",
+    "W długiej perspektywie podejście „{right}” przyniesie obywatelom więcej korzyści niż „{left}”.",
+    "Polityka w obszarze „{axis}” powinna odważniej realizować ideę „{right}”.",
+]
+_DIGEST_LEANS = [
+    (1.8, "Zdecydowane poparcie dla bieguna „{left}”, odpowiedzi są spójne."),
+    (2.6, "Umiarkowane ciążenie ku biegunowi „{left}” z pojedynczymi wyjątkami."),
+    (3.4, "Postawa wyważona, bez wyraźnej przewagi żadnego z biegunów; widoczne napięcia między odpowiedziami."),
+    (4.2, "Umiarkowane ciążenie ku biegunowi „{right}” z pojedynczymi wyjątkami."),
+    (5.1, "Zdecydowane poparcie dla bieguna „{right}”, odpowiedzi są spójne."),
+]
+_SUMMARY_TEMPLATES = [
+    "Twoje odpowiedzi malują obraz osoby, która ceni równowagę między wolnością jednostki a odpowiedzialnością wspólnoty. "
+    "Widać to zarówno w podejściu do spraw gospodarczych, jak i w ostrożności wobec gwałtownych zmian społecznych. "
+    "Takie podejście często spotyka się w ramach nurtu centrowego lub umiarkowanie liberalnego.",
+    "Charakteryzuje Cię pragmatyzm: oceniasz rozwiązania raczej po ich skutkach niż po ideologicznym rodowodzie. "
+    "Jednocześnie dostrzegasz rolę państwa w zapewnianiu bezpieczeństwa, co może sytuować Twoje poglądy blisko "
+    "chadecji lub umiarkowanego konserwatyzmu.",
+    "Twoje odpowiedzi sugerują, że wolność jednostki jest dla Ciebie kluczową wartością, co przejawia się w niechęci "
+    "do nadmiernych regulacji i otwartości na zmiany obyczajowe. Takie podejście często rezonuje z tradycją liberalną.",
+]
+
+
+class SyntheticModel:
+    """Generates deterministic, plausible responses from the prompt itself (same prompt -> same text)."""
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+
+    def _rng(self, prompt: str) -> random.Random:
+        return random.Random(f"{self.seed}:{prompt_hash(prompt)}")
+
+    def generate_content(self, prompt, **kwargs):
+        kind = prompt_kind(prompt)
+        if kind == "questions":
+            return FakeResponse(self._questions(prompt))
+        if kind == "digest":
+            return FakeResponse(self._digest(prompt))
+        return FakeResponse(self._rng(prompt).choice(_SUMMARY_TEMPLATES))
+
+    def _questions(self, prompt: str) -> str:
+        axis, left, right = _AXIS_PATTERN.search(prompt).groups()
+        count = int(_COUNT_PATTERN.search(prompt).group(1))
+        # Sub-topics are listed as '- topic' lines right after the sub-topic instruction
+        sub_topics = [line[2:] for line in prompt.split("\n") if line.startswith("- ")]
+        rng = self._rng(prompt)
+        statements = [f"W obszarze „{topic}” priorytetem powinna być zasada „{right}”." for topic in sub_topics[:count]]
+        while len(statements) < count:
+            template = rng.choice(_GENERAL_TEMPLATES)
+            statements.append(f"{template.format(axis=axis, left=left, right=right)} (wariant {len(statements) + 1})")
+        return "\n".join(statements)
+
+    def _digest(self, prompt: str) -> str:
+        left, right = re.search(r"\('(.+?)' vs '(.+?)'\)", prompt).groups()
+        values = [int(v) for v in _ANSWER_VALUE_PATTERN.findall(prompt)]
+        average = sum(values) / len(values) if values else 3
+        for upper_bound, text in _DIGEST_LEANS:
+            if average < upper_bound:
+                return f"{text.format(left=left, right=right)} Średnia odpowiedź: {average:.2f}."
+        return _DIGEST_LEANS[-1][1].format(left=left, right=right)
+
+
+# --- Latency and fault injection ---
+
+def parse_latency(spec: str):
+    """Parses a latency distribution in seconds, e.g. 'fixed:0.5', 'uniform:0.2,1.5', 'normal:0.8,0.2',
+    'lognormal:-0.5,0.6' (parameters of the underlying normal) or 'pareto:0.3,2.5' (scale, alpha - heavy tail).
+    Returns a function taking a random.Random and returning a delay."""
+    if not spec:
+        return lambda rng: 0.0
+    name, _, params = spec.partition(":")
+    args = [float(p) for p in params.split(",") if p]
+    distributions = {
+        "fixed": lambda rng: args[0],
+        "uniform": lambda rng: rng.uniform(args[0], args[1]),
+        "normal": lambda rng: max(0.0, rng.gauss(args[0], args[1])),
+        "lognormal": lambda rng: math.exp(rng.gauss(args[0], args[1])),
+        "pareto": lambda rng: args[0] * rng.paretovariate(args[1]),
+    }
+    if name not in distributions:
+        raise ValueError(f"Nieznany rozkład opóźnienia: '{name}'. Dostępne: {', '.join(distributions)}.")
+    return distributions[name]
+
+
+class FaultInjectingModel:
+    """Wraps a model with simulated latency, exceptions, truncated outputs and wrong line counts."""
+
+    def __init__(self, inner, latency: str = "", error_rate: float = 0.0, truncate_rate: float = 0.0,
+                 wrong_count_rate: float = 0.0, seed: int = 0):
+        self.inner = inner
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self.wrong_count_rate = wrong_count_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock: # random.Random is shared between request and digest threads
+            delay = self.latency(self._rng)
+            fail, truncate, wrong_count = (self._rng.random() < rate for rate in
+                                           (self.error_rate, self.truncate_rate, self.wrong_count_rate))
+            cut, drop_lines = self._rng.random(), self._rng.random() < 0.5
+        time.sleep(delay)
+        if fail:
+            raise InjectedFault("Injected upstream error")
+        text = self.inner.generate_content(prompt, **kwargs).text
+        if wrong_count:
+            lines = text.split("\n")
+            # Either lose the last lines or repeat some, like a model ignoring the requested count
+            lines = lines[:max(1, len(lines) - 2)] if drop_lines else lines + lines[:2]
+            text = "\n".join(lines)
+        if truncate:
+            text = text[:int(len(text) * cut)]
+        return FakeResponse(text)
+
+
+# --- Hedged requests ---
+
+metrics.describe("model_requests_total", "Model calls made by the app, by prompt kind.")
+metrics.describe("model_hedges_total", "Hedge requests actually sent to the alternate model (extra spend).")
+metrics.describe("model_hedge_wins_total", "Hedged calls answered by the alternate model.")
+metrics.describe("model_hedge_prompt_chars_total", "Prompt characters sent in hedge requests (extra spend proxy).")
+metrics.describe("model_hedge_tokens_total", "Tokens billed for hedge requests, when the backend reports usage.")
+
+
+def _is_valid_response(response) -> bool:
+    try:
+        return bool(response.text.strip())
+    except Exception: # Gemini raises on .text for blocked/empty candidates
+        return False
+
+
+class HedgedModel:
+    """Sends each call to the primary model and, if it hasn't answered after the hedge delay, also to the
+    alternate one. The first valid response wins; the other request is cancelled (or ignored once running).
+    The hedge delay is a percentile of recent primary latencies per prompt kind, or HEDGE_DELAY until
+    enough samples are collected. Primaries and hedges run on separate pools, and both the latencies and
+    the hedge delay are measured from the moment the primary call starts, so waiting for a free worker
+    under load neither inflates the percentile nor triggers hedges."""
+
+    def __init__(self, primary, alternate, percentile: float = 0.95, default_delay: float = 2.0,
+                 window: int = 200, min_samples: int = 20, workers: int = 16, hedge_workers: int = 16):
+        self.primary = primary
+        self.alternate = alternate
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.window = window
+        self.min_samples = min_samples
+        self._latencies = {} # {prompt kind: deque of primary latencies in seconds}
+        self._lock = threading.Lock()
+        self._primary_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="model-primary")
+        self._hedge_executor = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix="model-hedge")
+
+    def hedge_delay(self, kind: str) -> float:
+        with self._lock:
+            samples = sorted(self._latencies.get(kind, ()))
+        if len(samples) < self.min_samples:
+            return self.default_delay
+        return samples[min(len(samples) - 1, int(len(samples) * self.percentile))]
+
+    def _call_primary(self, kind: str, started: list, prompt, kwargs):
+        start = time.perf_counter()
+        started.append(start)
+        response = self.primary.generate_content(prompt, **kwargs)
+        # Recorded even when the primary loses, so the percentile isn't biased towards fast calls
+        with self._lock:
+            self._latencies.setdefault(kind, deque(maxlen=self.window)).append(time.perf_counter() - start)
+        return response
+
+    def generate_content(self, prompt, **kwargs):
+        kind = prompt_kind(prompt)
+        metrics.inc("model_requests_total", kind=kind)
+        started = [] # perf_counter() when a worker picks the primary call up
+        primary = self._primary_executor.submit(self._call_primary, kind, started, prompt, kwargs)
+
+        # The hedge delay counts from the start of the call; time spent queued for a worker doesn't count
+        delay = self.hedge_delay(kind)
+        timeout = delay
+        while True:
+            done, _ = wait([primary], timeout=timeout)
+            if done:
+                break
+            if started:
+                timeout = delay - (time.perf_counter() - started[0])
+                if timeout <= 0:
+                    break
+        if done and primary.exception() is None and _is_valid_response(primary.result()):
+            return primary.result()
+
+        # Primary is slow or already failed - hedge to the alternate model
+        hedge = self._hedge_executor.submit(self._send_hedge, kind, prompt, kwargs)
+        # Counted on completion, so hedges that lose the race (the wasted spend) are included
+        hedge.add_done_callback(lambda future: self._count_hedge_tokens(kind, future))
+        pending = {primary, hedge}
+        fallback = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    continue
+                response = future.result()
+                if _is_valid_response(response):
+                    for other in pending:
+                        other.cancel()
+                    if future is hedge:
+                        metrics.inc("model_hedge_wins_total", kind=kind)
+                    return response
+                fallback = fallback or response
+        if fallback is not None:
+            return fallback # Both invalid - let the caller's own checks handle the empty text
+        return primary.result() # Both failed - re-raise the primary error
+
+    def _send_hedge(self, kind: str, prompt, kwargs):
+        # Counted here rather than at submit, so a hedge cancelled while still queued isn't billed
+        metrics.inc("model_hedges_total", kind=kind)
+        metrics.inc("model_hedge_prompt_chars_total", len(prompt), kind=kind)
+        return self.alternate.generate_content(prompt, **kwargs)
+
+    def _count_hedge_tokens(self, kind: str, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        usage = getattr(future.result(), "usage_metadata", None)
+        if usage is not None and getattr(usage, "total_token_count", None):
+            metrics.inc("model_hedge_tokens_total", usage.total_token_count, kind=kind)
+
+
+def _fault_settings() -> dict:
+    return {
+        "latency": os.getenv("FAKE_LATENCY", ""),
+        "error_rate": float(os.getenv("FAKE_ERROR_RATE", "0")),
+        "truncate_rate": float(os.getenv("FAKE_TRUNCATE_RATE", "0")),
+        "wrong_count_rate": float(os.getenv("FAKE_WRONG_COUNT_RATE", "0")),
+    }
+
+
+def create_model_backend(backend: str, gemini_model=None, hedge_gemini_model=None):
+    """Builds the configured backend around the real Gemini model (used by 'gemini' and 'record').
+    If HEDGE_MODEL is set, calls are hedged against a second backend built around hedge_gemini_model."""
+    seed = int(os.getenv("FAKE_SEED", "0"))
+    primary = _create_single_backend(backend, gemini_model, seed)
+    if not os.getenv("HEDGE_MODEL"):
+        return primary
+    # Offline backends get an independent second instance (own faults/latency draws) as the alternate.
+    # When recording, only the primary writes the cassette; the alternate model's answers aren't replayed
+    alternate = _create_single_backend("gemini" if backend == "record" else backend,
+                                       hedge_gemini_model or gemini_model, seed + 1)
+    # Every digest, summary and request thread may be waiting on a primary call at once; doubled because
+    # a primary that lost to its hedge keeps its worker until it returns
+    primary_workers = 2 * (int(os.getenv("DIGEST_WORKERS", "4")) + int(os.getenv("SUMMARY_WORKERS", "8"))
+                           + int(os.getenv("MODEL_REQUEST_THREADS", "8")))
+    log.info("model_hedging_enabled", alternate=os.getenv("HEDGE_MODEL"), primary_workers=primary_workers)
+    return HedgedModel(primary, alternate,
+                       percentile=float(os.getenv("HEDGE_PERCENTILE", "0.95")),
+                       default_delay=float(os.getenv("HEDGE_DELAY", "2.0")),
+                       workers=primary_workers,
+                       hedge_workers=int(os.getenv("HEDGE_WORKERS", "16")))
+
+
+def _create_single_backend(backend: str, gemini_model, seed: int):
+    cassette_path = os.getenv("MODEL_CASSETTE", "model_cassette.jsonl")
+    if backend == "gemini":
+        backend_model = gemini_model
+    elif backend == "record":
+        backend_model = RecordingModel(gemini_model, cassette_path)
+    elif backend == "replay":
+        backend_model = ReplayModel(cassette_path)
+    elif backend == "synthetic":
+        backend_model = SyntheticModel(seed)
+    else:
+        raise ValueError(f"Nieznany MODEL_BACKEND: '{backend}'. Dostępne: gemini, record, replay, synthetic.")
+
+    fault_settings = _fault_settings()
+    if any(fault_settings.values()):
+        log.info("model_faults_injected", **fault_settings)
+        backend_model = FaultInjectingModel(backend_model, seed=seed, **fault_settings)
+    return backend_model
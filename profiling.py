@@ -0,0 +1,242 @@
+import os
+import sys
+import json
+import time
+import atexit
+import random
+import threading
+import functools
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from app_logging import get_logger
+
+# --- Opt-in sampling profiler ---
+# A fraction of requests (PROFILE_SAMPLE_RATE) is profiled: a background thread samples the stack of the
+# request thread every PROFILE_INTERVAL seconds, and named spans time the interesting steps (model calls,
+# scoring, session load/save, template rendering). Aggregates are written per route and worker to PROFILE_DIR:
+#   <route>.<pid>.folded      - flamegraph-compatible folded stacks ("frame;frame;frame count")
+#   <route>.<pid>.spans.json  - request and span counts / total / max durations
+# With PROFILE_SAMPLE_RATE=0 (default) nothing is installed and traced() returns functions unchanged.
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_FLUSH_INTERVAL = float(os.getenv("PROFILE_FLUSH_INTERVAL", "30"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_DEPTH = 64
+log = get_logger("profiling")
+
+_local = threading.local()
+_active = {} # {thread_id: _RequestProfile} of requests being sampled right now
+_active_lock = threading.Lock()
+_route_stacks = defaultdict(Counter) # {route: Counter(folded_stack -> samples)}
+_route_spans = defaultdict(dict) # {route: {span_name: {"count", "total_ms", "max_ms"}}}
+_aggregate_lock = threading.Lock()
+_sampler_started = False
+
+
+def enabled() -> bool:
+    return PROFILE_SAMPLE_RATE > 0
+
+
+class _RequestProfile:
+    def __init__(self):
+        self.route = None
+        self.started = time.perf_counter()
+        self.spans = [] # Names of currently open spans, outermost first
+        self.span_times = [] # (name, seconds) of finished spans
+        self.samples = Counter()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _sample_loop():
+    last_flush = time.monotonic()
+    while True:
+        time.sleep(PROFILE_INTERVAL)
+        with _active_lock:
+            active = list(_active.items())
+        if active:
+            frames = sys._current_frames()
+            for thread_id, profile in active:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                # Open spans go first so flamegraphs group samples by step
+                prefix = [f"[span {name}]" for name in profile.spans]
+                profile.samples[";".join(prefix + stack)] += 1
+        if time.monotonic() - last_flush >= PROFILE_FLUSH_INTERVAL:
+            flush()
+            last_flush = time.monotonic()
+
+
+def _ensure_sampler():
+    global _sampler_started
+    with _active_lock:
+        if _sampler_started:
+            return
+        _sampler_started = True
+    threading.Thread(target=_sample_loop, name="profile-sampler", daemon=True).start()
+    atexit.register(flush)
+
+
+def start_request():
+    """Decides whether the current request is sampled and, if so, starts sampling its thread."""
+    if random.random() >= PROFILE_SAMPLE_RATE:
+        _local.profile = None
+        return
+    _ensure_sampler()
+    profile = _RequestProfile()
+    _local.profile = profile
+    with _active_lock:
+        _active[threading.get_ident()] = profile
+
+
+def set_route(route: str):
+    profile = getattr(_local, "profile", None)
+    if profile is not None:
+        profile.route = route
+
+
+def finish_request(default_route: str):
+    """Stops sampling the current request and merges its samples into the per-route aggregate."""
+    profile = getattr(_local, "profile", None)
+    if profile is None:
+        return
+    _local.profile = None
+    with _active_lock:
+        _active.pop(threading.get_ident(), None)
+    route = profile.route or default_route
+    span_times = profile.span_times + [("request", time.perf_counter() - profile.started)]
+    with _aggregate_lock:
+        _route_stacks[route].update(profile.samples)
+        for name, seconds in span_times:
+            stats = _route_spans[route].setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["count"] += 1
+            stats["total_ms"] += seconds * 1000
+            stats["max_ms"] = max(stats["max_ms"], seconds * 1000)
+
+
+@contextmanager
+def span(name: str):
+    """Times a named step of a sampled request. A no-op for requests that are not sampled."""
+    profile = getattr(_local, "profile", None)
+    if profile is None:
+        yield
+        return
+    profile.spans.append(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.span_times.append((name, time.perf_counter() - started))
+        profile.spans.pop()
+
+
+def traced(name: str):
+    """Decorator wrapping a function in span(name). Returns the function unchanged when profiling is off."""
+    def decorator(func):
+        if not enabled():
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _route_slug(route: str) -> str:
+    slug = route.strip("/").replace("/", "_").replace("<", "").replace(">", "").replace(".", "_")
+    return slug or "index"
+
+
+def flush():
+    """Writes the aggregated profiles of this worker to PROFILE_DIR (runs on the sampler thread and at exit)."""
+    with _aggregate_lock:
+        stacks = {route: Counter(counter) for route, counter in _route_stacks.items()}
+        spans = json.loads(json.dumps(_route_spans))
+    if not spans:
+        return
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        for route, route_spans in spans.items():
+            base = os.path.join(PROFILE_DIR, f"{_route_slug(route)}.{os.getpid()}")
+            with open(f"{base}.folded", "w", encoding="utf-8") as f:
+                for stack, count in stacks.get(route, Counter()).most_common():
+                    f.write(f"{stack} {count}\n")
+            with open(f"{base}.spans.json", "w", encoding="utf-8") as f:
+                json.dump({"route": route, "interval_s": PROFILE_INTERVAL, "spans": route_spans}, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        log.warning("profiles_write_failed", path=PROFILE_DIR, error=e)
+
+
+class _ProfiledSessionInterface:
+    """Wraps the app's session interface so session (de)serialization shows up as spans."""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def open_session(self, app, request):
+        with span("session_open"):
+            return self.inner.open_session(app, request)
+
+    def save_session(self, app, session, response):
+        with span("session_save"):
+            return self.inner.save_session(app, session, response)
+
+
+class _ProfilingMiddleware:
+    """WSGI middleware bracketing the whole request, including session loading and saving."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        start_request()
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            finish_request("<unmatched>")
+
+
+def init_profiling(app):
+    """Installs the profiling hooks on a Flask app when PROFILE_SAMPLE_RATE > 0."""
+    if not enabled():
+        return
+    from flask import request, before_render_template, template_rendered
+
+    log.info("profiling_enabled", sample_rate=PROFILE_SAMPLE_RATE, path=PROFILE_DIR)
+    app.wsgi_app = _ProfilingMiddleware(app.wsgi_app)
+    app.session_interface = _ProfiledSessionInterface(app.session_interface)
+
+    @app.before_request
+    def _profile_route():
+        # Unmatched URLs share one bucket so 404 probes cannot create unbounded profile files
+        set_route(request.url_rule.rule if request.url_rule else "<unmatched>")
+
+    # render_template spans come from Flask's template signals
+    open_renders = threading.local()
+
+    def _render_started(sender, template, context, **extra):
+        open_renders.span = span("render_template")
+        open_renders.span.__enter__()
+
+    def _render_finished(sender, template, context, **extra):
+        render_span = getattr(open_renders, "span", None)
+        if render_span is not None:
+            open_renders.span = None
+            render_span.__exit__(None, None, None)
+
+    before_render_template.connect(_render_started, app, weak=False)
+    template_rendered.connect(_render_finished, app, weak=False)
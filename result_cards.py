@@ -0,0 +1,95 @@
+import os
+import hashlib
+from functools import lru_cache
+from html import escape
+
+# --- Shareable result cards ---
+# Lightweight SVG (optionally PNG) picture of the axis bars, used for sharing and Open Graph previews.
+# Scores are quantized before rendering so near-identical results share one cached card.
+
+# Percentage points per card bucket; must divide 50 so a centred result stays at 50%. At 25 a simulated
+# population of 20000 results maps to ~1350 distinct cards (93% cache hits, see
+# benchmarks/bench_result_cards.py); at 10 almost every result got its own card.
+CARD_QUANT_STEP = float(os.getenv("CARD_QUANT_STEP", "25"))
+CARD_CACHE_SIZE = int(os.getenv("CARD_CACHE_SIZE", "4096"))
+CARD_PNG_CACHE_SIZE = int(os.getenv("CARD_PNG_CACHE_SIZE", "128")) # PNGs are tens of KB each, SVGs ~2 KB
+
+CARD_WIDTH = 1200 # Recommended Open Graph image size
+CARD_HEIGHT = 630
+COLOR_LEFT = "rgb(48, 63, 159)" # Same as --bs-primary-rgb in style.css
+COLOR_RIGHT = "rgb(2, 119, 189)" # Same as --bs-info-rgb in style.css
+COLOR_TEXT = "rgb(33, 37, 41)"
+
+try:
+    import cairosvg # Optional, only needed for PNG cards
+except ImportError:
+    cairosvg = None
+
+
+def quantize_axes(axes_data: list) -> tuple:
+    """Turns create_axes_data() output into a hashable card key with scores rounded to CARD_QUANT_STEP."""
+    return tuple(
+        (axis["axis_name"], axis["pole_left"], axis["pole_right"],
+         max(0.0, min(100.0, round(axis["value_percent"] / CARD_QUANT_STEP) * CARD_QUANT_STEP)))
+        for axis in axes_data
+    )
+
+
+def card_etag(card_key: tuple) -> str:
+    return hashlib.sha1(repr(card_key).encode("utf-8")).hexdigest()[:16]
+
+
+@lru_cache(maxsize=CARD_CACHE_SIZE)
+def render_card_svg(card_key: tuple) -> str:
+    """Renders the card for a quantized key (see quantize_axes). Cached per key."""
+    margin_x = 80
+    bar_width = CARD_WIDTH - 2 * margin_x
+    row_height = (CARD_HEIGHT - 130) / max(len(card_key), 1)
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{CARD_WIDTH}" height="{CARD_HEIGHT}" viewBox="0 0 {CARD_WIDTH} {CARD_HEIGHT}" font-family="Lato, Helvetica, Arial, sans-serif">',
+        f'<rect width="{CARD_WIDTH}" height="{CARD_HEIGHT}" fill="#f8f9fa"/>',
+        f'<text x="{CARD_WIDTH / 2}" y="70" text-anchor="middle" font-size="42" font-weight="700" font-family="Playfair Display, Georgia, serif" fill="{COLOR_TEXT}">Test Poglądów Politycznych</text>',
+    ]
+    for i, (axis_name, pole_left, pole_right, value_percent) in enumerate(card_key):
+        top = 120 + i * row_height
+        right_width = bar_width * value_percent / 100
+        left_width = bar_width - right_width
+        parts.append(f'<text x="{CARD_WIDTH / 2}" y="{top + 20:.1f}" text-anchor="middle" font-size="24" font-weight="700" fill="{COLOR_TEXT}">{escape(axis_name)}</text>')
+        parts.append(f'<text x="{margin_x}" y="{top + 20:.1f}" font-size="20" fill="{COLOR_TEXT}">{escape(pole_left)}</text>')
+        parts.append(f'<text x="{margin_x + bar_width}" y="{top + 20:.1f}" text-anchor="end" font-size="20" fill="{COLOR_TEXT}">{escape(pole_right)}</text>')
+        parts.append(f'<rect x="{margin_x}" y="{top + 32:.1f}" width="{left_width:.1f}" height="34" fill="{COLOR_LEFT}"/>')
+        parts.append(f'<rect x="{margin_x + left_width:.1f}" y="{top + 32:.1f}" width="{right_width:.1f}" height="34" fill="{COLOR_RIGHT}"/>')
+        if 100 - value_percent > 15:
+            parts.append(f'<text x="{margin_x + 12}" y="{top + 56:.1f}" font-size="20" fill="#ffffff">≈{100 - value_percent:g}%</text>')
+        if value_percent > 15:
+            parts.append(f'<text x="{margin_x + bar_width - 12}" y="{top + 56:.1f}" text-anchor="end" font-size="20" fill="#ffffff">≈{value_percent:g}%</text>')
+    parts.append('</svg>')
+    return "\n".join(parts)
+
+
+def png_cards_available() -> bool:
+    """PNG cards (required for Open Graph previews) need the optional cairosvg package."""
+    return cairosvg is not None
+
+
+@lru_cache(maxsize=CARD_PNG_CACHE_SIZE)
+def render_card_png(card_key: tuple):
+    """Rasterises the SVG card. Returns None when cairosvg is not installed."""
+    if cairosvg is None:
+        return None
+    return cairosvg.svg2png(bytestring=render_card_svg(card_key).encode("utf-8"))
+
+
+def card_cache_info() -> dict:
+    """Hit/miss statistics of the card caches (for benchmarks and monitoring)."""
+    stats = {}
+    for name, func in (("svg", render_card_svg), ("png", render_card_png)):
+        info = func.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+        }
+    return stats
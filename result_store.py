@@ -0,0 +1,166 @@
+import os
+import re
+import json
+import hashlib
+import datetime
+import tempfile
+
+from app_logging import get_logger
+
+# --- Persistent, content-addressed quiz results ---
+# A result is stored once under an ID derived from the answers and the questions they answer,
+# so refreshing /summary or opening a shared /result/<id> link never calls the model again.
+
+RESULT_ID_LENGTH = 20
+INDEX_FILENAME = "index.tsv" # Append-only '<created_at>\t<result_id>' lines, in save order
+RESULT_ID_PATTERN = re.compile(rf"^[0-9a-f]{{{RESULT_ID_LENGTH}}}$")
+log = get_logger("result_store")
+
+
+def _default_results_dir() -> str:
+    """Returns a writable directory for stored results (falls back to /tmp on Render)."""
+    results_dir = os.getenv("RESULTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results'))
+    try:
+        os.makedirs(results_dir, exist_ok=True)
+    except Exception as e:
+        log.warning("results_dir_unavailable", path=results_dir, error=e)
+        results_dir = '/tmp/results'
+        os.makedirs(results_dir, exist_ok=True)
+    return results_dir
+
+
+def normalize_answers(answers_by_index: dict) -> dict:
+    """Returns {axis_name: [answer_text, ...]} ordered by question index (keys may be int or str)."""
+    return {
+        axis_name: [answer for _, answer in sorted(indexed_answers.items(), key=lambda item: int(item[0]))]
+        for axis_name, indexed_answers in answers_by_index.items()
+    }
+
+
+def compute_result_id(answers_by_index: dict, questions_by_axis: dict) -> str:
+    """Derives a stable ID from the answers and the identity of the question set they answer."""
+    canonical = json.dumps(
+        {"answers": normalize_answers(answers_by_index), "questions": questions_by_axis},
+        ensure_ascii=False, sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:RESULT_ID_LENGTH]
+
+
+def is_valid_result_id(result_id: str) -> bool:
+    return bool(RESULT_ID_PATTERN.match(result_id or ""))
+
+
+class ResultStore:
+    """Stores each result as one immutable JSON file named after its ID, plus an append-only index for exports."""
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or _default_results_dir()
+
+    def _path(self, result_id: str) -> str:
+        return os.path.join(self.directory, f"{result_id}.json")
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_FILENAME)
+
+    def get(self, result_id: str):
+        """Returns the stored result dict, or None if the ID is unknown or malformed."""
+        if not is_valid_result_id(result_id):
+            return None
+        try:
+            with open(self._path(result_id), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.error("result_read_failed", result_id=result_id, error=e)
+            return None
+
+    def save(self, result_id: str, answers_by_index: dict, questions_by_axis: dict, axes_data: list, summary_text: str,
+             summary_source: str = "llm") -> dict:
+        """Persists a result once. If it already exists the stored copy wins and is returned.
+        summary_source is 'llm', or 'fallback' for a local summary that upgrade_summary() may replace later."""
+        result = {
+            "result_id": result_id,
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "answers": normalize_answers(answers_by_index),
+            "questions": questions_by_axis,
+            "axes_data": axes_data,
+            "summary_text": summary_text,
+            "summary_source": summary_source,
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            # os.link fails if the target exists, so concurrent writers cannot replace a stored result
+            os.link(tmp_path, self._path(result_id))
+        except FileExistsError:
+            return self.get(result_id) or result
+        finally:
+            os.unlink(tmp_path)
+        # Single small O_APPEND write, so concurrent workers don't interleave lines
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(f"{result['created_at']}\t{result_id}\n")
+        return result
+
+    def upgrade_summary(self, result_id: str, summary_text: str):
+        """Replaces a fallback summary with the model's one. The only change ever made to a stored result."""
+        result = self.get(result_id)
+        if result is None or result.get("summary_source") != "fallback":
+            return result
+        result["summary_text"] = summary_text
+        result["summary_source"] = "llm"
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(result_id))
+        return result
+
+    def advance_index(self, cursor: int = 0, limit: int = None):
+        """Returns (end_cursor, has_more): the byte offset `limit` complete index lines after `cursor`
+        (or the end of the index). Cursors are byte offsets, so they stay valid as new results are appended."""
+        try:
+            with open(self.index_path, "rb") as f:
+                f.seek(cursor)
+                count = 0
+                while limit is None or count < limit:
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        return cursor, False # End of index (or a line still being written)
+                    cursor += len(line)
+                    count += 1
+                return cursor, f.readline().endswith(b"\n")
+        except FileNotFoundError:
+            return cursor, False
+
+    def iter_index(self, cursor: int = 0, end_cursor: int = None):
+        """Yields (created_at, result_id) index entries between two cursors, one line at a time."""
+        try:
+            with open(self.index_path, "rb") as f:
+                f.seek(cursor)
+                while end_cursor is None or cursor < end_cursor:
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        return
+                    cursor += len(line)
+                    created_at, _, result_id = line.decode("utf-8").rstrip("\n").partition("\t")
+                    yield created_at, result_id
+        except FileNotFoundError:
+            return
+
+    def rebuild_index(self) -> int:
+        """Recreates the index from the stored files, ordered by creation time. Returns the number of results."""
+        entries = []
+        for name in os.listdir(self.directory):
+            result_id = name[:-len(".json")]
+            if name.endswith(".json") and is_valid_result_id(result_id):
+                result = self.get(result_id)
+                if result is not None:
+                    entries.append((result["created_at"], result_id))
+        entries.sort()
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(f"{created_at}\t{result_id}\n" for created_at, result_id in entries)
+        os.replace(tmp_path, self.index_path)
+        return len(entries)